@@ -4,6 +4,42 @@ import numpy as np
 import pandas as pd
 import json
 
+from MyTools.unit_engine import UNIT_LIST, get_unit_df
+from MyTools.time_index import time_range_index
+from MyTools.period_align import period_series
+from MyTools.downsample import downsample_df, m4_indices
+from MyTools.chart_tools import load_chart_config
+from MyTools.data_cache import memory_cache, get_df_fingerprint
+from MyTools.chart_transport import serialize_chart, get_chart_spec_dict
+from MyTools import profiler
+
+
+# ~~~~~~~~~~~~~~~~~~~~~
+# Chart spec cache
+# ~~~~~~~~~~~~~~~~~~~~~
+# Serialized Vega-Lite specs (and their Arrow datasets), shared by every session. A spec is keyed on everything that goes into
+# the chart (see `line_frame.get_chart_spec`), so a rerun caused by an unrelated widget reuses it
+# without building the Altair chart again.
+SPEC_CACHE_MAX_BYTES = 128 * 1024 * 1024
+spec_cache = memory_cache(max_bytes = SPEC_CACHE_MAX_BYTES)
+
+# ~~~~~~~~~~~~~~~~~~~~~
+# Table view cache
+# ~~~~~~~~~~~~~~~~~~~~~
+# Sessions only save view parameters (unit, first and last period, ...) in st.session_state. The table
+# shown for a set of view parameters is materialized on demand from the shared dataset and saved here,
+# so sessions looking at the same view share one table. Views unused for VIEW_CACHE_TTL seconds (e.g.,
+# sessions that have gone idle) are evicted.
+VIEW_CACHE_MAX_BYTES = 256 * 1024 * 1024
+VIEW_CACHE_TTL = 30 * 60
+view_cache = memory_cache(max_bytes = VIEW_CACHE_MAX_BYTES, ttl = VIEW_CACHE_TTL)
+
+# A table with more periods than this is shown one page (window of periods) at a time.
+TABLE_PAGE_PERIODS = 36
+# A dataset with more periods than this is given date inputs, instead of selectboxes listing every period,
+# to choose its time horizon.
+PERIOD_PICKER_MAX_OPTIONS = 500
+
 # ~~~~~~~~~~~~~~~~~~~~~
 # Formatting related functions
 # ~~~~~~~~~~~~~~~~~~~~~
@@ -85,6 +121,18 @@ def get_chart_padding():
     return {"top": 5, "bottom":5, "left":50, "right":5}
 
 
+def get_chart_buckets(chart_width:int = 0) -> int:
+    """
+    This function returns the width (in pixels) of the plotting area of a line chart, which is the
+    number of buckets used to downsample long series (see MyTools/downsample.py).
+    chart_width:  width of the chart container. If 0, read it from config/chart_config.json.
+    """
+    if not chart_width:
+        chart_width = load_chart_config()['chart']['chart_width']
+    # The chart takes 0.7 / (0.2 + 0.7) of the box, see `line_frame.show_chart`.
+    return int(chart_width * 0.7 / 0.9)
+
+
 def get_table_widget_info(table_name:str) -> dict:
     """
     This function returns a dict cotaining information for buttons.
@@ -110,11 +158,10 @@ def get_table_widget_info(table_name:str) -> dict:
     return widget_info
 
 
-def adjust_table_indent(df_show_index, indent_step:int = 4):
+def adjust_table_indent(df_show_index, indent_config:dict, indent_step:int = 4):
     """
     This function returns a df index that is indent-adjusted.
     """
-    indent_config = st.session_state['indent_config']
     index = [f"{' ' * indent_config[i] * indent_step}{i}" for i in df_show_index]
 
     return index
@@ -141,16 +188,6 @@ def NumCol_accounting_format(cols:list) -> dict:
 
 
 
-def update_table_indent(state_name_df, state_name_adj_indent):
-    """
-    Adjust table indent.
-    """
-    st.session_state[state_name_df].index = adjust_table_indent(st.session_state[state_name_df].index)
-    # Turn adjust indent signal to False
-    st.session_state[state_name_adj_indent] = False
-
-
-
 # ~~~~~~~~~~~~~~~~~~~~~
 # Performance functions
 # ~~~~~~~~~~~~~~~~~~~~~
@@ -164,29 +201,21 @@ def get_YoY_window(freq:str):
     return 12 if freq == 'M' else (4 if freq == 'Q' else 1)
 
 
-def get_indexed_df(df):
+def set_unit_description(unit:str, data_name, original_description):
     """
-    This function return a df contains transformed indexed data, in which the the value for obs
-    in the first period (first row) will be set to 100.
-
-    Restriction: 
-        The first column must be Time.
-        Each row refers to obs from a period.
-    Example of return df:
-
-           Gross domestic product    ...  Nondefense  State and local
-        0              100.000000    ...  100.000000       100.000000
-        1              101.153131    ...  127.676428       102.973419
+    Update the description of a dataset (shown above the table) to match unit.
     """
-    # Drop Time column
-    df = df.drop('Time', axis = 1)
-    indexed_first_row = df.iloc[0, :].values
-    df = df/indexed_first_row * 100
-
-    return df
+    if unit in ['Level', 'Change']:
+        st.session_state[f'description_{data_name}'] = original_description
+    elif unit in ['Percent Change', 'Percent Change from Year Ago']:
+        st.session_state[f'description_{data_name}'] = 'Percent, %'
+    elif unit == 'Natural Log':
+        st.session_state[f'description_{data_name}'] = 'Natural Log'
+    elif unit == 'Index':
+        st.session_state[f'description_{data_name}'] = 'Index (Scale Value to 100 for The First Period)'
 
 
-def unit_transformation(unit:str, df, data_name, original_description):
+def unit_transformation(unit:str, df, data_name, original_description, period_slice = slice(None), fingerprint:str = None):
     """
     This function convert the df to a specific unit listed below.
 
@@ -197,34 +226,18 @@ def unit_transformation(unit:str, df, data_name, original_description):
             'Natural Log', 'Index'
             ]
     data_unit:  a certain unit above.
+    period_slice: row positions of the periods to return, e.g., slice(10, 14).
+    fingerprint: content hash of df, the key of memoized units (e.g., line_frame.fingerprint). Computed if not given.
+
+    df must contain ALL periods of the dataset. Units are computed over the full dataset and memoized
+    (see MyTools/unit_engine.py), so the change in the first period shown is computed against the period
+    before it, and picking another time horizon only slices the memoized result.
     """
-    cols = df.columns.to_list()
-    cols.remove('Time')
     freq = data_name[-1] # data frequency, such as M, Q, A.
     window = get_YoY_window(freq)
 
-    result = df[['Time']]
-    if unit == 'Level':
-        result = df
-        st.session_state[f'description_{data_name}'] = original_description
-    elif unit == 'Change':
-        result = pd.concat([result, df[cols].diff(1)], axis = 1)
-        st.session_state[f'description_{data_name}'] = original_description
-    elif unit == 'Change from Year Ago':
-        result = pd.concat([result, df[cols].diff(window)], axis = 1)
-    elif unit == 'Percent Change':
-        result = pd.concat([result, df[cols].pct_change(periods = 1) * 100], axis = 1)
-        st.session_state[f'description_{data_name}'] = 'Percent, %'
-    elif unit == 'Percent Change from Year Ago':
-        result = pd.concat([result, df[cols].pct_change(periods = window) * 100], axis = 1)
-        st.session_state[f'description_{data_name}'] = 'Percent, %'
-    elif unit == 'Natural Log':
-        result = pd.concat([result, np.log(df[cols])], axis = 1)
-        st.session_state[f'description_{data_name}'] = 'Natural Log'
-    elif unit == 'Index':
-        df_indexed = get_indexed_df(df)
-        result = pd.concat([result, df_indexed], axis = 1)
-        st.session_state[f'description_{data_name}'] = 'Index (Scale Value to 100 for The First Period)'
+    result = get_unit_df(unit, df, data_name, window, period_slice, fingerprint)
+    set_unit_description(unit, data_name, original_description)
 
     return result
 
@@ -246,63 +259,124 @@ def get_default_period(time_list:list, default_obs):
 
 
 
-def get_table_df(df):
+def init_session_state(state_name, state_value):
+    """
+    Initialize the default value for session state.
+    """
+    if state_name not in st.session_state:
+        st.session_state[state_name] = state_value
+
+
+
+class table_model():
     """
-    df: 
+    A typed table of a dataset, built once per view and shared by the table and the chart.
+
+    df:
                Time  Gross domestic product  ...  Nondefense  State and local
         0    1947Q1                 243.164  ...       4.166           13.318
         1    1947Q2                 245.968  ...       5.319           13.714
 
+    is kept as:
+        values:         a contiguous float64 block, one row per period and one column per variable.
+        time_labels:    1947Q1, 1947Q2, ...
+        names:          Gross domestic product, Personal consumption expenditures, Goods, ...
+        row_labels:     names with indent (see `adjust_table_indent`), shown in the table.
 
-    df.transpose() is the following:
-                                                   0        1    ...        312        313
-        Time                                    1947Q1   1947Q2  ...     2025Q1     2025Q2
-        Gross domestic product                 243.164  245.968  ...  30042.113  30485.729
-        Personal consumption expenditures      156.161  160.031  ...  20554.984  20789.926
-
-    Returned df:
-                                                1947Q1   1947Q2  ...     2025Q1     2025Q2
-        Gross domestic product                 243.164  245.968  ...  30042.113  30485.729
-        Personal consumption expenditures      156.161  160.031  ...  20554.984  20789.926
+    table_df (the table to show) is a transposed view of values, and `get_plot_df` only copies the
+    columns of selected variables, so neither goes through an object-dtype transpose of the dataset.
     """
-    df = df.transpose()
-    df.columns = df.loc['Time', :].values
-    df = df.drop('Time')
+    def __init__(self, df, indent_config:dict = {}):
+        cols = df.columns.to_list()
+        cols.remove('Time')
+        self.values = np.ascontiguousarray(df[cols].to_numpy(dtype = 'float64'))
+        self.time_labels = pd.Index(df['Time'].astype(str).to_numpy(dtype = 'object'))
+        self.names = pd.Index(cols)
+        self.row_labels = pd.Index(adjust_table_indent(cols, indent_config)) if indent_config else self.names
+        self.nbytes = self.values.nbytes
+        # {(page, page_size): (page df, column config)}, see `get_page`.
+        self.pages = {}
 
+        # Table to show:
+        #                                             1947Q1   1947Q2  ...     2025Q1     2025Q2
+        #     Gross domestic product                 243.164  245.968  ...  30042.113  30485.729
+        #     Personal consumption expenditures      156.161  160.031  ...  20554.984  20789.926
+        self.table_df = pd.DataFrame(self.values.T, index = self.row_labels, columns = self.time_labels, copy = False)
 
-    return df
 
+    def __len__(self):
+        return len(self.names)
 
 
-def init_session_state(state_name, state_value):
-    """
-    Initialize the default value for session state.
+    def get_n_pages(self, page_size:int) -> int:
+        return max(1, -(-len(self.time_labels) // page_size))
+
+
+    def get_page(self, page:int, page_size:int):
+        """
+        Return the table of periods in a page (0 refers to the first page_size periods), together with its
+        column config. Both are built once per page and reused, since the table is shared by sessions.
+        The page df is a view of table_df.
+        """
+        if (page, page_size) not in self.pages:
+            page_df = self.table_df.iloc[:, page * page_size:(page + 1) * page_size]
+            self.pages[(page, page_size)] = (page_df, NumCol_accounting_format(page_df.columns))
+
+        return self.pages[(page, page_size)]
+
+
+    def get_plot_df(self, selected_index):
+        """
+        This function returns a df for ploting, made of variables selected_index (row positions in table_df).
+
+        Returned plot_df:
+                   Gross domestic product Personal consumption expenditures    Goods Durable goods
+            1947Q1                 243.16                            156.16    95.59         20.72
+            1947Q2                 245.97                            160.03    98.25         21.35
+        """
+        return pd.DataFrame(self.values[:, selected_index], index = self.time_labels, columns = self.names[selected_index])
+
+
+
+def get_long_plot_df(df, n_buckets:int = 0):
     """
-    if state_name not in st.session_state:
-        st.session_state[state_name] = state_value
+    This function reshapes a plot df (see `table_model.get_plot_df`) to long format, which is the dataset shared by
+    every layer of the line chart.
 
+    df:
+               Gross domestic product  Personal consumption expenditures
+        1947Q1                 243.16                             156.16
+        1947Q2                 245.97                             160.03
 
-def get_plot_df(selected_index, state_name_df):
+    Returned df:
+             Time                                key   value
+        0  1947Q1              Gross domestic product  243.16
+        1  1947Q2              Gross domestic product  245.97
+        2  1947Q1   Personal consumption expenditures  156.16
+        3  1947Q2   Personal consumption expenditures  160.03
+
+    n_buckets:  If > 0, each series is downsampled to the chart width separately (see MyTools/downsample.py).
+    Missing obs (NaN) are dropped, so the dataset only contains obs that are drawn.
     """
-    This function returns a df for ploting.
+    time_values = df.index.to_numpy()
+    parts = []
+    for i, col in enumerate(df.columns):
+        values = df.iloc[:, i].to_numpy(dtype = 'float64')
+        rows = m4_indices(values, n_buckets) if n_buckets else np.arange(len(values))
+        rows = rows[~np.isnan(values[rows])]
+        parts.append(pd.DataFrame({'Time':time_values[rows], 'key':col, 'value':values[rows]}))
+
+    return pd.concat(parts, ignore_index = True)
 
-    st.session_state[state_name_df]:
-                                              1947Q1 1947Q2  ...    2025Q1    2025Q2
-        Gross domestic product                243.16 245.97  ... 30,042.11 30,485.73
-        Personal consumption expenditures     156.16 160.03  ... 20,554.98 20,789.93
-            Goods                              95.59  98.25  ...  6,432.30  6,471.11
 
-    Returned plot_df:
-               Gross domestic product Personal consumption expenditures    Goods Durable goods
-        1947Q1                 243.16                            156.16    95.59         20.72
-        1947Q2                 245.97                            160.03    98.25         21.35
+
+def get_period_dates(period):
+    """
+    Return the first and last day (datetime.date) of a period, e.g., '2025Q1' -> (2025-01-01, 2025-03-31).
     """
-    index = st.session_state[state_name_df].index[selected_index].values
-    plot_df = st.session_state[state_name_df].copy().loc[index, :].transpose()
-    plot_df.columns = [i.strip() for i in plot_df] # remove indent.
+    period = pd.Period(str(period))
+    return period.start_time.date(), period.end_time.date()
 
-    return plot_df
-    
 
 
 def format_time_column(df):
@@ -312,9 +386,57 @@ def format_time_column(df):
 
 
 
+def get_view_key(data_name, fingerprint:str, unit:str, first_period, last_period, indent_config:dict) -> tuple:
+    """
+    Return the key of a table view in view_cache: dataset, unit, first and last period, and indent.
+    """
+    return (data_name, fingerprint, unit, first_period, last_period, json.dumps(indent_config, sort_keys = True))
+
+
+
+def get_view(view_key:tuple, df, time_index, indent_config:dict):
+    """
+    Return the table_model of a view (see `get_view_key`) of df, whose Time column is indexed by time_index.
+    Tables are shared by sessions through view_cache. Do not modify the returned table.
+    """
+    data_name = view_key[0]
+    with profiler.stage('table view', name = data_name) as record:
+        df_show = view_cache.get(view_key)
+        record['cache'] = 'miss' if df_show is None else 'hit'
+        if df_show is None:
+            unit, first_period, last_period = view_key[2:5]
+            window = get_YoY_window(data_name[-1])
+            period_slice = time_index.get_slice(first_period, last_period)
+            with profiler.stage('unit_transformation', name = unit, rows = len(df)):
+                df_unit = get_unit_df(unit, df, data_name, window, period_slice, fingerprint = view_key[1])
+            with profiler.stage('table_model (transpose)', rows = len(df_unit)):
+                df_show = table_model(df_unit, indent_config)
+            df_show = view_cache.put(view_key, df_show)
+        record['rows'], record['bytes'] = len(df_show.time_labels), df_show.nbytes
+
+    return df_show
+
+
+
+def warm_default_view(data_name, df, indent_config:dict = {}, default_obs:int = -4):
+    """
+    Compute the view a line_frame(data_name, df, default_obs = default_obs, indent_config = indent_config)
+    shows first (Level, the default periods), so its first render is served from view_cache and unit_cache.
+    """
+    time_index = time_range_index(df['Time'])
+    fingerprint = get_df_fingerprint(df)
+    # As in `line_frame.init_default_period`.
+    df = df.copy(deep = False)
+    df['Time'] = format_time_column(df)
+    first_period, last_period = get_default_period(df['Time'].values, default_obs)
+
+    return get_view(get_view_key(data_name, fingerprint, 'Level', first_period, last_period, indent_config), df, time_index, indent_config)
+
+
+
 
 class line_frame():
-    def __init__(self, data_name, df, description:str = 'test', box_height:int = 700, default_obs:int = -4, indent_config:dict = {}, source:str = '', df_bg_line = [], show_zero = False):
+    def __init__(self, data_name, df, description:str = 'test', box_height:int = 700, default_obs:int = -4, indent_config:dict = {}, source:str = '', df_bg_line = [], show_zero = False, chart_width:int = 0, transport:str = 'arrow', bg_line_how:str = 'mean'):
         self.data_name = data_name
         self.df = df
         self.description = description
@@ -323,25 +445,31 @@ class line_frame():
         self.indent_config = indent_config
         self.data_source = source
         self.df_bg_line = df_bg_line # it will be True if you call `add_baselines` to  add lines at the background.
+        # Background lines indexed by period ordinals, and the aggregator (mean, last, ...) used to plot them over
+        # a chart of lower frequency, e.g., daily policy rates over quarterly data (see MyTools/period_align.py).
+        self.bg_series = period_series(df_bg_line) if len(df_bg_line) else None
+        self.bg_line_how = bg_line_how
         self.zero_line = show_zero
+        # Long series are downsampled to this many buckets before being plotted, unless users choose "Full Resolution".
+        self.n_buckets = get_chart_buckets(chart_width)
+        # How chart data is sent to the browser, 'arrow' or 'json' (see MyTools/chart_transport.py).
+        self.transport = transport
+        # Binary-search index over Time, used to select a time horizon. Build it before Time is converted to string.
+        self.time_index = time_range_index(self.df['Time'])
+        # Content hash of the dataset, computed before Time is converted to string (which is slower to hash).
+        self.fingerprint = get_df_fingerprint(self.df)
 
         self.initialize_session_state()
 
-    def init_default_df_to_show(self):
+    def init_default_period(self):
         ###------Format Time column and get first, last period------###
         # Convert values in Time column to string.
         self.df['Time'] = format_time_column(self.df)
 
-        # Get start and end period
-        first_period, last_period = get_default_period(list(self.df['Time']), self.obs)
-
+        # Get start and end period. By default, it shows the last four obs.
+        first_period, last_period = get_default_period(self.df['Time'].values, self.obs)
 
-        ###------Form dataset------###
-        # df to show by default. By default, it shows the last four obs.
-        # Do not format the indent of df until it is being persented in the box.
-        df_show = self.df.query("Time >= @first_period and Time <= @last_period")
-        df_show = get_table_df(df_show)
-        return df_show, first_period, last_period
+        return first_period, last_period
 
 
     def initialize_session_state(self):
@@ -349,8 +477,11 @@ class line_frame():
         When you need to define a new session state:
             First, assign its name to a class attribute (self.state_name_<variable name>)
             Second, append its value to dict "ss" through ss[self.state_name_<variable name>] = ...
+
+        Session state only saves view parameters (unit, periods, selected lines, formats). Tables are
+        materialized from the shared dataset when they are shown (see `get_df_show`).
         """
-        df_show, first_period, last_period = self.init_default_df_to_show()
+        first_period, last_period = self.init_default_period()
 
         ss = {
                 f'description_{self.data_name}': self.description,  # For description
@@ -365,16 +496,14 @@ class line_frame():
         self.state_name_first_period = f'first_period_{self.data_name}'
         # Used to save users choice of the last period of dataset.
         self.state_name_last_period = f'last_period_{self.data_name}'
-        # For df to show
-        self.state_name_df = f'df_show_{self.data_name}'
         # For df to plot when user clicks "Chart" button.
         self.state_name_selected_cols = f'selected_cols_{self.data_name}'
-        # For indent adjument signal
-        self.state_name_adj_indent = f'adj_indent_{self.data_name}'
         # For table-chart switch signal
         self.state_name_show_table = f'show_table_{self.data_name}'
-        # For modify signal
-        self.state_name_modify_content = f'modify_content_{self.data_name}'
+        # For full resolution signal. If False, long series are downsampled before being plotted.
+        self.state_name_full_resolution = f'full_resolution_{self.data_name}'
+        # For the page of the table to show, if the table is too wide to show at once. -1 is the last page.
+        self.state_name_table_page = f'table_page_{self.data_name}'
         # For line formats (line style, width, and color)
         np.random.seed(400) # Specify random seed to generate color scheme.
         self.state_name_line_format_info = f'line_format_info_{self.data_name}'
@@ -384,22 +513,50 @@ class line_frame():
         ss[self.state_name_all_periods] = False
         ss[self.state_name_first_period] = first_period
         ss[self.state_name_last_period] = last_period
-        ss[self.state_name_df] = df_show
         ss[self.state_name_selected_cols] = []
-        ss[self.state_name_adj_indent] = True
         ss[self.state_name_show_table] = True
-        ss[self.state_name_modify_content] = False
-        ss[self.state_name_line_format_info] = init_line_format(standardize_col_name(self.df.columns.to_list()[1:]))
+        ss[self.state_name_full_resolution] = False
+        ss[self.state_name_table_page] = -1
+        # Background lines (see `append_bg_line`) are formatted as the other lines.
+        bg_names = self.bg_series.names.to_list() if self.bg_series is not None else []
+        ss[self.state_name_line_format_info] = init_line_format(standardize_col_name(self.df.columns.to_list()[1:] + bg_names))
 
         for i in ss.keys():
             init_session_state(i, ss[i])
-        print(init_line_format(standardize_col_name(self.df.columns.to_list()[1:])))
+
+
+    def get_view_key(self) -> tuple:
+        """
+        Return the view parameters that decide the table to show: dataset, unit, first and last period.
+        """
+        return get_view_key(
+                self.data_name,
+                self.fingerprint,
+                st.session_state[self.state_name_var_unit],
+                st.session_state[self.state_name_first_period],
+                st.session_state[self.state_name_last_period],
+                self.indent_config,
+                )
+
+
+    def get_df_show(self):
+        """
+        Return the table_model of the view parameters saved in session state.
+        Tables are shared by sessions through view_cache. Do not modify the returned table.
+        """
+        return get_view(self.get_view_key(), self.df, self.time_index, self.indent_config)
 
         
+    @st.fragment
     def show(self, n_legend_cols:int = 4):
         """
         This function returns a format chart which allow you to select a particular column to plot.
 
+        It runs as a fragment (st.fragment): clicking Modify/Table/Chart/Format or selecting rows in
+        the table only reruns this frame, not the page script, so datasets are not loaded again and
+        other frames on the page are not rebuilt. Submitting the Modify or Format dialog still reruns
+        the whole page, which is what closes the dialog.
+
 
         df: dataframe contains data. 
              Time     Gross domestic product  Personal consumption expenditures  ...  State and local  
@@ -418,9 +575,6 @@ class line_frame():
 	    			"Goods":1}
         """
 
-        # Allow altair to deal with a dataset with more than 5000 obs.
-        alt.data_transformers.disable_max_rows()
-
         ###------Container for description and buttons------###
         container = st.container(
                 border = False,
@@ -472,39 +626,24 @@ class line_frame():
         box = st.container(border = False, horizontal_alignment = 'left', vertical_alignment = 'center', horizontal = True, height = self.box_height, key = self.key('DataTableFrame'))
 
         with box:
-            # If pass indent config file, then format table index.
-            if self.indent_config and st.session_state[self.state_name_adj_indent]:
-                st.session_state['indent_config'] = self.indent_config
-                update_table_indent(self.state_name_df, self.state_name_adj_indent)
-
             if st.session_state[self.state_name_show_table]: # show table
                 self.show_table()
             else: # show chart
                 self.show_chart(n_legend_cols = n_legend_cols)
+
+        # Stages of a rerun of this fragment, if the profiler is on (see MyTools/profiler.py).
+        profiler.show_panel(fragment = True)
             
 
 
     @st.dialog("Choose Time Horizon")
     def modify_BEA_table(self):
-    
-        qrts_list = list(self.df['Time'].values)
+
+        time_col = self.df['Time']
         with st.form(f'{self.data_name}_modify'):
-            # Selectbox: First period.
-            first_period = st.selectbox(
-                    'First Period:',
-                    options = qrts_list,
-                    key = self.key('st'),
-                    index = qrts_list.index(st.session_state[self.state_name_first_period])
-                    )
+            # First and last period.
+            first_period, last_period = self.select_time_horizon()
 
-            # Selectbox: Last period.
-            last_period = st.selectbox(
-                    'Last Period:',
-                    options = qrts_list,
-                    key = self.key('et'),
-                    index = qrts_list.index(st.session_state[self.state_name_last_period])
-                    )
-    
             # Check box: if to plot data in all periods.
             st.session_state[self.state_name_all_periods] = st.checkbox(
                     'All Periods',
@@ -513,7 +652,15 @@ class line_frame():
                     )
 
             if st.session_state[self.state_name_all_periods]:
-                first_period, last_period = qrts_list[0], qrts_list[-1]
+                first_period, last_period = time_col.iloc[0], time_col.iloc[-1]
+
+            # Check box: if to plot every obs. Otherwise, long series are downsampled to the chart width.
+            st.session_state[self.state_name_full_resolution] = st.checkbox(
+                    'Full Resolution',
+                    key = self.key('FullResolution'),
+                    value = st.session_state[self.state_name_full_resolution],
+                    help = 'Plot every observation. Long series may render slowly.'
+                    )
 
             # Update first and last period to session state.
             st.session_state[self.state_name_first_period] = first_period
@@ -521,12 +668,7 @@ class line_frame():
 
 
             ###------Select data unit------###
-            unit_list = [
-                    'Level',
-                    'Change', 'Change from Year Ago',
-                    'Percent Change', 'Percent Change from Year Ago',
-                    'Natural Log', 'Index'
-                    ]
+            unit_list = UNIT_LIST
             data_unit = st.selectbox(
                     'Units',
                     options = unit_list,
@@ -543,28 +685,66 @@ class line_frame():
             ###------Submit button------###
             submit = st.form_submit_button('Refresh Table', key = self.key('ModifySubmit'))
             if submit:
-                # Save filtered df.
-                df_show = unit_transformation(
-                        data_unit,
-                        self.df.query('Time >= @first_period and Time <= @last_period'),
-                        self.data_name,
-                        self.description
-                        )
-
-                # Adjust indent for variable column.
-                df_show = get_table_df(df_show)
-                st.session_state[self.state_name_df] = df_show
-                # Reset adjust df indent signal since new df is formed.
-                if self.indent_config:
-                    st.session_state[self.state_name_adj_indent] = True
-                else:
-                    st.session_state[self.state_name_adj_indent] = False
-                    
-                st.session_state[self.state_name_modify_content] = True
+                # The new table is materialized from the view parameters saved above (see `get_df_show`).
+                set_unit_description(data_unit, self.data_name, self.description)
+                # Show the last page of the new table. The slider keeps its own state under its key, so the key
+                # is dropped for the slider to start again from the saved page (see `select_table_page`).
+                st.session_state[self.state_name_table_page] = -1
+                st.session_state.pop(self.key('TablePage'), None)
 
                 st.rerun()
 
     
+    def get_period_position(self, period) -> int:
+        """
+        Return the row position of a period in self.df, through a binary search over the time index.
+        """
+        return min(self.time_index.get_slice(period, period).start, len(self.time_index) - 1)
+
+
+    def select_time_horizon(self):
+        """
+        Return the first and last period chosen by users.
+
+        A short dataset is given two selectboxes listing every period. A dataset with more than
+        PERIOD_PICKER_MAX_OPTIONS periods is given two date inputs instead, so the dialog does not grow
+        with the length of the dataset. Chosen dates are resolved by a binary search to the periods that
+        contain them, e.g., 2019-12-15 refers to 2019-12 in a monthly dataset (see `time_range_index`).
+        """
+        time_col = self.df['Time']
+        first_position = self.get_period_position(st.session_state[self.state_name_first_period])
+        last_position = self.get_period_position(st.session_state[self.state_name_last_period])
+
+        if len(time_col) <= PERIOD_PICKER_MAX_OPTIONS:
+            # Selectbox: First period.
+            first_period = st.selectbox('First Period:', options = time_col.values, key = self.key('st'), index = first_position)
+            # Selectbox: Last period.
+            last_period = st.selectbox('Last Period:', options = time_col.values, key = self.key('et'), index = last_position)
+            return first_period, last_period
+
+        min_date = get_period_dates(time_col.iloc[0])[0]
+        max_date = get_period_dates(time_col.iloc[-1])[1]
+        first_date = st.date_input(
+                'First Period:',
+                value = get_period_dates(time_col.iloc[first_position])[0],
+                min_value = min_date, max_value = max_date,
+                key = self.key('st_date'),
+                )
+        last_date = st.date_input(
+                'Last Period:',
+                value = get_period_dates(time_col.iloc[last_position])[1],
+                min_value = min_date, max_value = max_date,
+                key = self.key('et_date'),
+                )
+
+        period_slice = self.time_index.get_slice(str(first_date), str(last_date))
+        if period_slice.start == period_slice.stop:
+            st.warning('No observation between the first and the last period. The time horizon is not changed.')
+            return time_col.iloc[first_position], time_col.iloc[last_position]
+
+        return time_col.iloc[period_slice.start], time_col.iloc[period_slice.stop - 1]
+
+
     @st.dialog("Lines Format")
     def format_lines_in_chart(self):
         """
@@ -591,11 +771,8 @@ class line_frame():
             if submit:
                 for one_line_name in Format_info.keys():
                     st.session_state[self.state_name_line_format_info][one_line_name] = Format_info[one_line_name]
-                print(st.session_state[self.state_name_line_format_info])
-                print(Format_info)
 
                 st.rerun()
-                print(st.session_state[self.state_name_line_format_info])
 
 
 
@@ -637,34 +814,60 @@ class line_frame():
         
     
     def show_table(self):
-    
-        st.dataframe(
-                st.session_state[self.state_name_df],
-                height = 'stretch',
-                column_config = NumCol_accounting_format(st.session_state[self.state_name_df].columns),
-                key = self.key('DataTableContent')
+        """
+        Show the table. A table with more than TABLE_PAGE_PERIODS periods is shown one page at a time, and
+        users move between pages through a slider, so only the visible periods are sent to the browser.
+        """
+        df_show = self.get_df_show()
+        n_pages = df_show.get_n_pages(TABLE_PAGE_PERIODS)
+        if n_pages == 1:
+            page_df, column_config = df_show.get_page(0, TABLE_PAGE_PERIODS)
+            st.dataframe(page_df, height = 'stretch', column_config = column_config, key = self.key('DataTableContent'))
+            return
+
+        with st.container():
+            page = self.select_table_page(df_show, n_pages)
+            page_df, column_config = df_show.get_page(page, TABLE_PAGE_PERIODS)
+            st.dataframe(page_df, height = self.box_height - 100, column_config = column_config, key = self.key('DataTableContent'))
+
+
+
+    def select_table_page(self, df_show, n_pages:int) -> int:
+        """
+        Return the page of the table chosen by users. Pages are labeled by their first and last period.
+        """
+        labels = df_show.time_labels
+        page = st.session_state[self.state_name_table_page]
+        page = page if 0 <= page < n_pages else n_pages - 1
+
+        page = st.select_slider(
+                'Periods',
+                options = range(n_pages),
+                value = page,
+                format_func = lambda i: f'{labels[i * TABLE_PAGE_PERIODS]} to {labels[min((i + 1) * TABLE_PAGE_PERIODS, len(labels)) - 1]}',
+                key = self.key('TablePage'),
+                label_visibility = 'collapsed',
                 )
+        st.session_state[self.state_name_table_page] = page
+
+        return page
     
     
     
     def show_chart(self, n_legend_cols = 4, border = False):
 
         content_height = self.box_height - 40
-        df = st.session_state[self.state_name_df]
+        df = self.get_df_show()
         boxLeft, boxRight = st.columns(
                 [0.2, 0.7],
                 border = border,
                 vertical_alignment = 'top',
                 )
-    
-        # Adjust indent
-        if st.session_state[self.state_name_modify_content] and st.session_state[self.state_name_adj_indent]:
-            update_table_indent(self.state_name_df, self.state_name_adj_indent)
-    
+
         # A list of variables to plot.
         with boxLeft:
             gdp_items = st.dataframe(
-                        pd.DataFrame(df.index, columns = ['Items']),
+                        pd.DataFrame(df.row_labels, columns = ['Items']),
                         on_select = 'rerun',
                         selection_mode = 'multi-row',
                         hide_index = True,
@@ -676,26 +879,73 @@ class line_frame():
     
         # Chart
         with boxRight:
-            plot_df = get_plot_df(selected_items, self.state_name_df)
             # Update selected col to session state for formatting lines.
-            st.session_state[self.state_name_selected_cols] = plot_df.columns.to_list()
-
-            if len(self.df_bg_line):
-                plot_df = self.append_bg_line(plot_df)
+            st.session_state[self.state_name_selected_cols] = df.names[selected_items].to_list()
 
             # Show chart only if users select one or more items.
             if selected_items:
+                spec, datasets = self.get_chart_spec(df, selected_items, content_height, n_legend_cols)
+                st.vega_lite_chart(spec = get_chart_spec_dict(spec, datasets), key = self.key('ChartRightBoxChart'))
+
+
+    def get_chart_spec(self, df_show, selected_items:list, content_height:int, n_legend_cols:int):
+        """
+        Return the Vega-Lite spec (a json string) of the line chart for rows selected_items of df_show (a table_model),
+        together with the Arrow datasets it refers to (see `serialize_chart`).
+
+        Specs are cached by a fingerprint of their inputs: view parameters of df_show, selected rows, the
+        format of selected lines, and the chart settings. On a cache hit, the chart is not built again.
+        """
+        # Long series are downsampled to the chart width, unless users choose "Full Resolution".
+        n_buckets = 0 if st.session_state[self.state_name_full_resolution] else self.n_buckets
+        selected_cols = standardize_col_name(st.session_state[self.state_name_selected_cols])
+        line_format_info = st.session_state[self.state_name_line_format_info]
+
+        spec_key = (
+                self.get_view_key(),
+                tuple(selected_items),
+                json.dumps([line_format_info.get(i) for i in selected_cols]),
+                # Legend is sorted by the keys of line_format_info.
+                tuple(line_format_info.keys()),
+                st.session_state[f'zero_line_{self.data_name}'],
+                n_legend_cols,
+                content_height,
+                n_buckets,
+                self.transport,
+                get_df_fingerprint(self.df_bg_line) if len(self.df_bg_line) else '',
+                self.bg_line_how,
+                )
+
+        with profiler.stage('chart spec', name = self.data_name) as record:
+            cached = spec_cache.get(spec_key)
+            record['cache'] = 'miss' if cached is None else 'hit'
+            if cached is None:
+                plot_df = df_show.get_plot_df(selected_items)
+                if len(self.df_bg_line):
+                    plot_df = self.append_bg_line(plot_df)
+
                 # Hide grid line for both axis.
-                chart = self.get_chart_lines(plot_df, content_height, n_legend_cols = n_legend_cols).configure_axis(grid = False)
+                with profiler.stage('get_chart_lines', rows = plot_df.size):
+                    chart = self.get_chart_lines(plot_df, content_height, n_legend_cols = n_legend_cols, n_buckets = n_buckets).configure_axis(grid = False)
+                with profiler.stage('serialize_chart', name = self.transport):
+                    cached = spec_cache.put(spec_key, serialize_chart(chart, self.transport))
+
+            spec, datasets = cached
+            record['bytes'] = len(spec) + sum(len(i) for i in datasets.values())
 
-                st.altair_chart(chart, key = self.key('ChartRightBoxChart'))
+        return cached
     
     
 
 
-    def get_chart_lines(self, df, content_height:int, n_legend_cols = 4):
+    def get_chart_lines(self, df, content_height:int, n_legend_cols = 4, n_buckets:int = 0):
         """
         Return a line chart.
+
+        The data is reshaped to long format (Time, key, value) in python and attached to the layered
+        chart once, so every layer (rule, lines, zero_mark) refers to the same dataset in the spec
+        (top-level `datasets`) and the browser does not need to fold it.
+        n_buckets:  If > 0, downsample each series to n_buckets (see `get_long_plot_df`).
     
         bg_lines:   An alt.Chart() item, e.g., a plot of growth rate of gdp.
                     If you pass a `bg_lines`, this function will add `bg_lines` (an alt chart item) to the main chart.
@@ -706,7 +956,7 @@ class line_frame():
         ###------Standardize column name for df------###
         df.columns = standardize_col_name(df.columns.to_list())
         col_selected = df.columns.to_list()
-        df['Time'] = df.index.values
+        long_df = get_long_plot_df(df, n_buckets)
 
     
         ###------Define height for elements------###
@@ -734,7 +984,8 @@ class line_frame():
     
         ###------Define spike line------###
         rule_tooltip = format_tooltip(col_selected)
-        rule = alt.Chart(df).mark_rule(color = 'grey').encode(
+        # The rule shows the value of every line in its tooltip, so pivot the long data back to one row per period.
+        rule = alt.Chart().transform_pivot('key', value = 'value', groupby = ['Time']).mark_rule(color = 'grey').encode(
                 x = 'Time',
                 y = alt.value(0),
                 y2 = alt.value('height'),
@@ -744,7 +995,7 @@ class line_frame():
     
     
         ###------Define lines------###
-        lines = alt.Chart(df).transform_fold(col_selected).mark_line().encode(
+        lines = alt.Chart().mark_line().encode(
                 x = alt.X('Time', title = None, axis = alt.Axis(labelAngle = 0)),
                 y = alt.Y('value:Q', title = None),
                 color = alt.Color(
@@ -809,14 +1060,17 @@ class line_frame():
         if st.session_state[f'zero_line_{self.data_name}']:
             zero_mark_opacity = alt.value(1)
     
-        zero_mark = alt.Chart(df).mark_line(color = 'grey', size = 3).encode(
+        zero_mark = alt.Chart().mark_line(color = 'grey', size = 3).encode(
                 x = 'Time',
                 y = alt.datum(0),
                 opacity = zero_mark_opacity,
                 ).transform_filter(bar_selector)
     
         ###------Add selection bar below the chart------###
-        bar = alt.Chart(self.df).mark_bar().encode(
+        bar_df = self.df[['Time', self.df.columns[1]]]
+        if not st.session_state[self.state_name_full_resolution]:
+            bar_df = downsample_df(bar_df.set_index('Time'), self.n_buckets).reset_index()
+        bar = alt.Chart(bar_df).mark_bar().encode(
                 x = alt.X('Time', title = None, axis = None),
                 y = alt.Y(self.df.columns[1], title = None, axis = None),
                 #y = alt.Y(df.columns[0], title = None, axis = None),
@@ -824,7 +1078,8 @@ class line_frame():
                 ).add_params(bar_selector).properties(height = bar_height)
     
         ###------Merge chart items------###
-        chart = alt.layer(rule, lines, zero_mark)
+        # Layers share the long df, which is saved once in the top-level `datasets` of the spec.
+        chart = alt.layer(rule, lines, zero_mark, data = long_df)
     
         # Use configure_view to change color and size of the chart border.
         chart = (chart & bar).configure_view(stroke = 'grey', strokeWidth = .2)
@@ -841,21 +1096,17 @@ class line_frame():
             
     def append_bg_line(self, df):
         """
-        This function append columns in df_bg_line to the main df so they will be ploted
-        together.
-        """
+        This function append columns in df_bg_line to the main df (a plot df, indexed by periods of the
+        dataset) so they will be ploted together.
 
-        first_period, last_period = df.index.min(), df.index.max()
-        df_bg = self.df_bg_line
-        df_bg['Time'] = format_time_column(df_bg)
-        df_bg.index = df_bg['Time'].values
-        df_bg = (df_bg
-                .query("Time >= @first_period and Time <= @last_period")
-                .drop('Time', axis = 1)
-                )
-        df = pd.concat([df, df_bg], axis = 1)
+        Background lines are aligned to the periods of df on period ordinals: a series of higher frequency
+        is reduced by self.bg_line_how in each period of df, and a series of lower frequency takes its value
+        of the period that contains each period of df. df_bg_line is left unchanged.
+        """
+        periods = pd.PeriodIndex(df.index, freq = self.time_index.freq or 'D')
+        df_bg = pd.DataFrame(self.bg_series.align(periods, self.bg_line_how), index = df.index, columns = self.bg_series.names)
 
-        return df
+        return pd.concat([df, df_bg], axis = 1)
                     
 
 
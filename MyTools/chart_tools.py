@@ -1,6 +1,40 @@
+import os, json
 import streamlit as st
 from streamlit.components.v1 import iframe
 
+from MyTools.data_cache import memory_cache, get_file_version
+
+
+# Parsed config files, shared by every session. A config file is read again only when it is modified.
+config_cache = memory_cache(max_bytes = 1024 * 1024)
+
+
+def load_chart_config(path_config = os.path.join('config', 'chart_config.json')) -> dict:
+    """
+    Return the content of chart_config.json. Do not modify the returned dict.
+    """
+    path_config = os.path.abspath(path_config)
+    version = get_file_version(path_config)
+    chart_config = config_cache.get(path_config, version)
+    if chart_config is None:
+        with open(path_config) as f:
+            chart_config = config_cache.put(path_config, json.load(f), version)
+    return chart_config
+
+
+def load_css(path_css = os.path.join('config', 'config.css')) -> str:
+    """
+    Return the content of a css file, e.g., config/config.css.
+    """
+    path_css = os.path.abspath(path_css)
+    version = get_file_version(path_css)
+    css = config_cache.get(path_css, version)
+    if css is None:
+        with open(path_css) as f:
+            css = config_cache.put(path_css, f.read(), version)
+    return css
+
+
 def get_chart_height(WHratio: str, chart_width: int) -> int:
     """
     This function compute and return the correspoinding chart height give a certain width-height
@@ -0,0 +1,92 @@
+"""
+Transport of chart data from the server to the browser.
+
+By default, Altair embeds chart data in the Vega-Lite spec as JSON values (one dict per row). In 'arrow'
+transport, each dataset is serialized to Arrow IPC bytes and the spec refers to it by name. Streamlit
+sends the bytes to the browser as they are (see `st.vega_lite_chart`), so numeric columns travel in a
+compact columnar form, and a cached chart does not need to be serialized again on each rerun.
+
+'arrow' transport needs pyarrow. Without it, charts are sent in 'json' transport.
+"""
+import json
+import hashlib
+import threading
+
+import altair as alt
+
+try:
+    import pyarrow as pa
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+
+TRANSPORT_MODES = ['arrow', 'json']
+
+# Altair data transformers are global to all threads, see `serialize_chart`.
+transformer_lock = threading.Lock()
+
+
+def to_arrow_bytes(df) -> bytes:
+    """
+    Serialize df to Arrow IPC (stream format) bytes. String columns with few distinct values, such as
+    the series name in a long df, are dictionary-encoded.
+    """
+    df = df.copy(deep = False)
+    for col in df.columns:
+        if df[col].dtype == object and df[col].nunique() < len(df) / 2:
+            df[col] = df[col].astype('category')
+
+    table = pa.Table.from_pandas(df, preserve_index = False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+
+def arrow_data_transformer(data, datasets:dict) -> dict:
+    """
+    Altair data transformer: save data as Arrow bytes in datasets under a content hash, and refer to it by name.
+    Every row is kept: unlike the default transformer, there is no max_rows limit (5000 rows).
+    """
+    data_bytes = to_arrow_bytes(data)
+    name = f'data-{hashlib.blake2b(data_bytes, digest_size = 16).hexdigest()}'
+    datasets[name] = data_bytes
+    return {'name':name}
+
+
+alt.data_transformers.register('line_frame_arrow', arrow_data_transformer)
+
+
+
+def serialize_chart(chart, transport:str = 'arrow'):
+    """
+    Return (spec, datasets) of an Altair chart.
+        spec:     the Vega-Lite spec as a json string.
+        datasets: a dict {<name>: Arrow bytes} of datasets the spec refers to. Empty in 'json' transport
+                  (or without pyarrow), where the data is embedded in spec.
+
+    Charts can have more than 5000 obs, so the max_rows limit of Altair is lifted, only while the chart
+    is serialized. The data transformer in use outside serialize_chart is not changed.
+    """
+    datasets = {}
+    with transformer_lock:
+        if transport == 'json' or not HAS_PYARROW:
+            with alt.data_transformers.enable('default', max_rows = None):
+                return chart.to_json(), datasets
+
+        with alt.data_transformers.enable('line_frame_arrow', datasets = datasets):
+            spec = json.dumps(chart.to_dict())
+    return spec, datasets
+
+
+
+def get_chart_spec_dict(spec:str, datasets:dict) -> dict:
+    """
+    Return the spec dict to pass to `st.vega_lite_chart`, with Arrow datasets attached.
+    """
+    spec = json.loads(spec)
+    if datasets:
+        spec['datasets'] = {**spec.get('datasets', {}), **datasets}
+    return spec
@@ -0,0 +1,197 @@
+"""
+Columnar (Parquet) copies of the datasets in data/parse_data.
+
+For each <data_name>.csv, a <data_name>.parquet is saved next to it:
+    - Time is stored as a typed period column (daily, monthly, quarterly or annual).
+    - Other columns are stored as float64.
+    - The (mtime, size) of the source csv is saved in the file metadata. A parquet file whose source
+      version differs from the current csv is ignored and rebuilt.
+
+The csv files remain the source of truth. Parquet copies are built either by `load_dataset` the first
+time a csv is parsed, or all at once through the converter:
+
+    python -m MyTools.columnar_store [directory]
+
+pyarrow is optional. Without it, datasets are always parsed from the csv files.
+"""
+import os, argparse
+from pathlib import Path
+import pandas as pd
+
+from MyTools.data_cache import get_file_version, atomic_write
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+
+# Key of the source version in parquet metadata.
+SOURCE_VERSION_KEY = b'source_version'
+
+# Map the frequency suffix of data name (e.g., NGDP-BEA-Q) to a pandas period frequency.
+PERIOD_FREQ = {
+        'D':'D',
+        'M':'M',
+        'Q':'Q',
+        'A':'Y',
+        }
+
+
+def get_data_frequency(path_data) -> str:
+    """
+    This function returns the frequency (D, M, Q, or A) of a dataset from its file name.
+    If path_data = './NGDP-BEA-Q.csv', `Path().stem` returns NGDP-BEA-Q and the frequency is Q.
+    Return '' if the file name does not end with a known frequency.
+    """
+    freq = Path(path_data).stem.split('-')[-1]
+    return freq if freq in PERIOD_FREQ else ''
+
+
+
+def parse_time_column(time_col, freq:str):
+    """
+    This function converts the Time column (e.g., 2025-08-01, 2025-08, 2025Q2, 2025) to a period column.
+    freq: D, M, Q, or A.
+    """
+    if freq in ['Q', 'A']:
+        return pd.Series(pd.PeriodIndex(time_col.astype(str), freq = PERIOD_FREQ[freq]), name = 'Time')
+    try:
+        return pd.to_datetime(time_col, format = 'ISO8601').dt.to_period(PERIOD_FREQ[freq])
+    except pd.errors.OutOfBoundsDatetime:
+        # Dates beyond the datetime range (1678-2262), e.g., synthetic scale-ups in benchmarks/bench_pipeline.py.
+        # numpy counts days (months) since 1970-01-01, which are the ordinals of daily (monthly) periods.
+        ordinals = time_col.to_numpy(dtype = str).astype(f'datetime64[{PERIOD_FREQ[freq]}]').astype('int64')
+        return pd.Series(pd.PeriodIndex.from_ordinals(ordinals, freq = PERIOD_FREQ[freq]), name = 'Time')
+
+
+
+def read_csv_dataset(path_data):
+    """
+    This function parses a csv file in data/parse_data. It returns a df in which Time is a period column
+    (if the frequency can be told from the file name) and the other columns are float64.
+    """
+    df = pd.read_csv(path_data)
+    cols = df.columns.to_list()
+    cols.remove('Time')
+    df = df.astype({col:'float64' for col in cols})
+
+    freq = get_data_frequency(path_data)
+    if freq:
+        df['Time'] = parse_time_column(df['Time'], freq)
+
+    return df
+
+
+
+def get_columnar_path(path_data):
+    """
+    Return the path of the parquet copy of a csv file.
+    """
+    return str(Path(path_data).with_suffix('.parquet'))
+
+
+
+def encode_version(version) -> bytes:
+    return repr(tuple(version)).encode()
+
+
+
+def read_columnar(path_columnar, version = None):
+    """
+    Return the df saved in a parquet file.
+    If version is given and differs from the source version saved in the file, return None. The version
+    is read from the file footer (schema metadata), so an out of date file is not read at all.
+    A file that cannot be read (e.g., truncated or corrupted) is treated as missing: return None, so the
+    caller parses the csv file and rebuilds the parquet copy.
+    """
+    if not HAS_PYARROW or not os.path.exists(path_columnar):
+        return None
+
+    try:
+        if version is not None:
+            metadata = pq.read_schema(path_columnar).metadata or {}
+            if metadata.get(SOURCE_VERSION_KEY) != encode_version(version):
+                return None
+
+        return pq.read_table(path_columnar).to_pandas()
+    except (pa.ArrowInvalid, OSError):
+        return None
+
+
+
+def write_columnar(df, path_columnar, version = None):
+    """
+    Save df to a parquet file together with the version of its source.
+    The file is written to a temporary path first, so readers never see a partially written file.
+    """
+    if not HAS_PYARROW:
+        return
+
+    table = pa.Table.from_pandas(df, preserve_index = False)
+    if version is not None:
+        metadata = dict(table.schema.metadata or {})
+        metadata[SOURCE_VERSION_KEY] = encode_version(version)
+        table = table.replace_schema_metadata(metadata)
+
+    with atomic_write(path_columnar) as path_tmp:
+        pq.write_table(table, path_tmp)
+
+
+
+def read_dataset(path_data, version = None):
+    """
+    Return the dataset of a csv file, reading its parquet copy when the copy is up to date.
+    Otherwise, parse the csv file and (re)build the parquet copy.
+    """
+    if version is None:
+        version = get_file_version(path_data)
+
+    path_columnar = get_columnar_path(path_data)
+    df = read_columnar(path_columnar, version)
+    if df is not None:
+        return df
+
+    df = read_csv_dataset(path_data)
+    try:
+        write_columnar(df, path_columnar, version)
+    except OSError:
+        # e.g., read-only file system. The csv file is still usable.
+        pass
+
+    return df
+
+
+
+def convert_parse_data(data_dir):
+    """
+    This function builds (or rebuilds) the parquet copy of every csv file in data_dir.
+    Return a list of converted file names.
+    """
+    converted = []
+    for path_data in sorted(Path(data_dir).glob('*.csv')):
+        version = get_file_version(path_data)
+        write_columnar(read_csv_dataset(path_data), get_columnar_path(path_data), version)
+        converted.append(path_data.name)
+
+    return converted
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Convert csv files in data/parse_data to parquet.')
+    parser.add_argument('data_dir', nargs = '?', default = os.path.join('data', 'parse_data'))
+    args = parser.parse_args()
+
+    if not HAS_PYARROW:
+        parser.error('pyarrow is required to build parquet files. Install it through `pip install pyarrow`.')
+
+    for name in convert_parse_data(args.data_dir):
+        print(f'Converted {name}')
+
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,214 @@
+import os
+import time
+import hashlib
+import tempfile
+import itertools
+import threading
+import contextlib
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+def get_file_version(path_data):
+    """
+    Return (mtime, size) of a file. A value computed from a file is valid as long as its file version does not change.
+    """
+    stat = os.stat(path_data)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+
+@contextlib.contextmanager
+def atomic_write(path):
+    """
+    Yield a temporary path, unique to this call, in the directory of path. When the block ends, the
+    temporary file replaces path in one step, so readers never see a partially written file. If the block
+    raises, the temporary file is removed and path is left as it was.
+
+    Each call has its own temporary file (tempfile.mkstemp), so threads and processes writing the same
+    path never write to the same temporary file. The file keeps the permissions of the file it replaces.
+    """
+    fd, path_tmp = tempfile.mkstemp(prefix = f'{os.path.basename(path)}.', suffix = '.tmp', dir = os.path.dirname(path) or '.')
+    os.close(fd)
+    try:
+        # mkstemp creates the file readable by its owner only.
+        mode = os.stat(path).st_mode & 0o777 if os.path.exists(path) else 0o644
+        os.chmod(path_tmp, mode)
+        yield path_tmp
+        os.replace(path_tmp, path)
+    except BaseException:
+        if os.path.exists(path_tmp):
+            os.remove(path_tmp)
+        raise
+
+
+
+def get_df_fingerprint(df) -> str:
+    """
+    Return a hash of the content of df (column names, Time and values).
+    Two dfs with the same content have the same fingerprint, so it can be used as a cache key.
+    """
+    h = hashlib.blake2b(digest_size = 16)
+    h.update(repr(df.columns.to_list()).encode())
+    for i in range(df.shape[1]):
+        col = df.iloc[:, i]
+        if isinstance(col.dtype, pd.PeriodDtype):
+            h.update(str(col.dtype).encode())
+            values = col.array.asi8
+        else:
+            values = col.to_numpy()
+        if values.dtype.kind in 'biuf':
+            h.update(np.ascontiguousarray(values).tobytes())
+        else:
+            h.update(repr(values.tolist()).encode())
+    return h.hexdigest()
+
+
+
+def get_object_size(value) -> int:
+    """
+    This function estimates the memory (in bytes) held by a cached value.
+    DataFrames and Series are measured through `memory_usage(deep = True)`, str and bytes through len().
+    Tuples, lists and dicts are measured by the sum of their items (values for dicts).
+    Other objects with an `nbytes` attribute (e.g., numpy arrays) are measured by nbytes.
+    Other objects count as 0 byte, so they never trigger an eviction.
+    """
+    if isinstance(value, (tuple, list)):
+        return sum(get_object_size(i) for i in value)
+    if isinstance(value, dict):
+        return sum(get_object_size(i) for i in value.values())
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index = True, deep = True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index = True, deep = True))
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    return int(getattr(value, 'nbytes', 0))
+
+
+
+def set_read_only(df):
+    """
+    This function returns a df with the content of df, backed by read-only arrays, so a df shared by every
+    session (e.g., in dataset_cache) cannot be modified in place: writing a value (e.g., df.iloc[0, 1] = -1.0)
+    in it or in a shallow copy of it raises an error. Adding or replacing columns of a shallow copy still works.
+    """
+    parts = []
+    # Consecutive columns of the same kind (periods or numpy dtypes) are kept together, in the order of df.
+    for is_period, cols in itertools.groupby(df.columns, key = lambda col: isinstance(df[col].dtype, pd.PeriodDtype)):
+        cols = list(cols)
+        if is_period:
+            # Setting a period column in a df copies it, so the column is built read-only in its own df.
+            for col in cols:
+                ordinals = df[col].array.asi8.copy()
+                ordinals.flags.writeable = False
+                parts.append(pd.DataFrame({col:pd.arrays.PeriodArray(ordinals, dtype = df[col].dtype)}, index = df.index, copy = False))
+            continue
+
+        part = df[cols].copy()
+        # Columns of the same dtype are views of one block: freeze the column and every array it is a view of.
+        for col in cols:
+            values = part[col].to_numpy()
+            while isinstance(values, np.ndarray):
+                values.flags.writeable = False
+                values = values.base
+        parts.append(part)
+
+    return pd.concat(parts, axis = 1, copy = False)
+
+
+
+class memory_cache():
+    """
+    A thread-safe LRU cache bounded by a memory budget (max_bytes).
+
+    Streamlit imports a module once per server process, so a memory_cache created at module level is
+    shared by every session and every rerun.
+
+    Each entry can carry a `version` (e.g., the mtime of the file the value was computed from). A `get`
+    with a different version drops the stale entry and reports a miss, so the caller recomputes it.
+
+    ttl (seconds, optional): entries that have not been used for ttl seconds are evicted, e.g., views
+    of a dataset that were materialized for sessions which have gone idle.
+    """
+    def __init__(self, max_bytes:int, sizeof = get_object_size, ttl:float = None):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.ttl = ttl
+        self.entries = OrderedDict() # key: (version, value, size, last used time)
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+
+    def get(self, key, version = None):
+        """
+        Return the value saved under key, or None if it is missing or its version is out of date.
+        """
+        now = time.monotonic()
+        with self.lock:
+            self._expire(now)
+            entry = self.entries.get(key)
+            if entry is None or entry[0] != version:
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+
+            # Mark as most recently used.
+            self.entries[key] = entry[:3] + (now,)
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+
+    def put(self, key, value, version = None):
+        """
+        Save value under key. Least recently used entries are evicted until the cache fits in max_bytes.
+        A value larger than the whole budget is not cached.
+        """
+        size = self.sizeof(value)
+        now = time.monotonic()
+        with self.lock:
+            self._expire(now)
+            if key in self.entries:
+                self._drop(key)
+            if size > self.max_bytes:
+                return value
+
+            self.entries[key] = (version, value, size, now)
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes:
+                self._drop(next(iter(self.entries)))
+
+        return value
+
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
+
+
+    def _expire(self, now:float):
+        """
+        Evict entries unused for more than ttl seconds. The caller must hold self.lock.
+        Entries are kept from the least to the most recently used, so the scan stops at the first fresh entry.
+        """
+        if self.ttl is None:
+            return
+        while self.entries:
+            key, entry = next(iter(self.entries.items()))
+            if now - entry[3] < self.ttl:
+                break
+            self._drop(key)
+
+
+    def _drop(self, key):
+        """
+        Remove an entry. The caller must hold self.lock.
+        """
+        self.total_bytes -= self.entries.pop(key)[2]
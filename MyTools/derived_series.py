@@ -0,0 +1,149 @@
+import os
+import numpy as np
+import pandas as pd
+
+from MyTools.data_cache import memory_cache, get_file_version, set_read_only
+from MyTools.load_data import load_dataset
+from MyTools import profiler
+
+
+# ~~~~~~~~~~~~~~~~~~~~~
+# Derived series
+# ~~~~~~~~~~~~~~~~~~~~~
+# Series computed from datasets in data/parse_data (e.g., RGDP = NGDP / GDP deflator), declared as nodes:
+#
+#     <name>: {'op': <operation in OPERATIONS>, 'inputs': [<data_name or name of another node>, ...], <options>}
+#
+# Each input is either a dataset (data/parse_data/<data_name>.csv) or another node, so nodes form a DAG.
+# Each node is computed in one vectorized pass over the whole table, and its result is shared by every
+# session. The version of a node is the versions (mtime, size) of the files it depends on, so a node is
+# only computed again when one of the files upstream of it changes.
+DATA_DIR = os.path.join('data', 'parse_data')
+
+DERIVED_SERIES = {
+        ###------Percentage share of NGDP------###
+        'NGDP-BEA-Q_share':{'op':'share', 'inputs':['NGDP-BEA-Q'], 'denominator':'Gross domestic product'},
+        'NGDP-BEA-A_share':{'op':'share', 'inputs':['NGDP-BEA-A'], 'denominator':'Gross domestic product'},
+
+        ###------RGDP------###
+        # Change in private inventories has no deflator, so its real value is left empty.
+        'RGDP_Q_deflated':{'op':'deflate', 'inputs':['NGDP-BEA-Q', 'GDPDeflator-BEA-Q']},
+        'RGDP_A_deflated':{'op':'deflate', 'inputs':['NGDP-BEA-A', 'GDPDeflator-BEA-A']},
+        # Real net exports = real exports - real imports
+        'RGDP_Q':{'op':'difference', 'inputs':['RGDP_Q_deflated'], 'name':'Net exports of goods and services',
+                  'minuend':'Exports', 'subtrahend':'Imports'},
+        'RGDP_A':{'op':'difference', 'inputs':['RGDP_A_deflated'], 'name':'Net exports of goods and services',
+                  'minuend':'Exports', 'subtrahend':'Imports'},
+        }
+
+DERIVED_CACHE_MAX_BYTES = 128 * 1024 * 1024
+derived_cache = memory_cache(max_bytes = DERIVED_CACHE_MAX_BYTES)
+
+
+# ~~~~~~~~~~~~~~~~~~~~~
+# Operations
+# ~~~~~~~~~~~~~~~~~~~~~
+
+def get_values(df):
+    """
+    Return the columns (except Time) of df and their values as a 2-D float64 array.
+    """
+    cols = df.columns.drop('Time')
+    return cols, df[cols].to_numpy(dtype = 'float64')
+
+
+
+def make_df(time_col, cols, values):
+    df = pd.DataFrame(values, columns = cols)
+    df.insert(0, 'Time', time_col.reset_index(drop = True))
+    return df
+
+
+
+def share(df, denominator:str):
+    """
+    Percentage share of each column in `denominator`, rounded to 2 digits.
+    """
+    cols, values = get_values(df)
+    base = values[:, [cols.get_loc(denominator)]]
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        return make_df(df['Time'], cols, np.round(values / base * 100, 2))
+
+
+
+def deflate(df, df_price):
+    """
+    Real values of df: each column divided by the column of the same name in df_price (a price index,
+    e.g., GDP deflator, 2017 = 100) in the same period, times 100. Columns without a price index are NaN.
+    """
+    cols, values = get_values(df)
+    price_cols, price_values = get_values(df_price)
+
+    # Row of the same period and column of the same name in df_price, -1 if there is none.
+    rows = pd.Index(df_price['Time']).get_indexer(df['Time'])
+    col_pos = price_cols.get_indexer(cols)
+    price = price_values[rows[:, None], col_pos[None, :]] if len(price_cols) else np.empty(values.shape)
+    price[(rows < 0)[:, None] | (col_pos < 0)[None, :]] = np.nan
+
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        return make_df(df['Time'], cols, values / price * 100)
+
+
+
+def difference(df, name:str, minuend:str, subtrahend:str):
+    """
+    Set column `name` to minuend - subtrahend (added as the last column if df has no column `name`).
+    """
+    df = df.copy(deep = False)
+    df[name] = df[minuend].to_numpy() - df[subtrahend].to_numpy()
+    return df
+
+
+
+OPERATIONS = {
+        'share':share,
+        'deflate':deflate,
+        'difference':difference,
+        }
+
+
+# ~~~~~~~~~~~~~~~~~~~~~
+# Evaluate nodes
+# ~~~~~~~~~~~~~~~~~~~~~
+
+def get_node_version(name:str, data_dir = DATA_DIR) -> tuple:
+    """
+    Return the version of a dataset (its file version) or of a node (the versions of its inputs).
+    """
+    if name not in DERIVED_SERIES:
+        return get_file_version(os.path.join(data_dir, f'{name}.csv'))
+    return tuple(get_node_version(i, data_dir) for i in DERIVED_SERIES[name]['inputs'])
+
+
+
+def get_derived_series(name:str, data_dir = DATA_DIR):
+    """
+    This function returns the df of a derived series (a node in DERIVED_SERIES) or of a dataset in
+    data_dir. Time is the first column.
+
+    A node is computed from its inputs only if it is not cached for the current version of its inputs.
+    Inputs that are nodes are evaluated (and cached) the same way.
+
+    As for `load_dataset`, each caller receives a shallow copy of the cached (read-only) df.
+    """
+    if name not in DERIVED_SERIES:
+        return load_dataset(os.path.join(data_dir, f'{name}.csv'))
+
+    key = (os.path.abspath(data_dir), name)
+    with profiler.stage('derived_series', name = name) as record:
+        version = get_node_version(name, data_dir)
+        df = derived_cache.get(key, version)
+        record['cache'] = 'miss' if df is None else 'hit'
+        if df is None:
+            node = dict(DERIVED_SERIES[name])
+            operation = OPERATIONS[node.pop('op')]
+            inputs = [get_derived_series(i, data_dir) for i in node.pop('inputs')]
+            df = derived_cache.put(key, set_read_only(operation(*inputs, **node)), version)
+        record['rows'] = len(df)
+
+        return df.copy(deep = False)
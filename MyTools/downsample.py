@@ -0,0 +1,70 @@
+import numpy as np
+
+
+# ~~~~~~~~~~~~~~~~~~~~~
+# Min/max bucketing (M4) downsampling
+# ~~~~~~~~~~~~~~~~~~~~~
+# A line drawn on a chart that is `n_buckets` pixels wide cannot show more than one column of pixels per
+# bucket. Keeping the first, last, min and max obs of each bucket draws exactly the same pixels as the
+# full series, with at most 4 obs per bucket.
+
+
+def get_bucket_edges(n_obs:int, n_buckets:int):
+    """
+    Return the row positions at which each bucket starts, plus n_obs at the end.
+    """
+    return np.linspace(0, n_obs, n_buckets + 1).astype('int64')
+
+
+
+def first_in_bucket(positions, bucket_id):
+    """
+    Given sorted row positions and the bucket each row belongs to, return the first position of each bucket.
+    """
+    _, first = np.unique(bucket_id[positions], return_index = True)
+    return positions[first]
+
+
+
+def m4_indices(values, n_buckets:int):
+    """
+    This function returns the sorted row positions to keep for a 1-D series (values), so the series
+    can be drawn on a chart `n_buckets` pixels wide without changing its visual shape.
+
+    For each bucket, keep the first and last obs, as well as the obs that reach the min and max.
+    NaN is ignored, except that the first and last non-NaN obs are always kept.
+    """
+    n_obs = len(values)
+    if n_obs <= 4 * n_buckets:
+        return np.arange(n_obs)
+
+    edges = get_bucket_edges(n_obs, n_buckets)
+    sizes = np.diff(edges)
+    bucket_id = np.repeat(np.arange(n_buckets), sizes)
+
+    with np.errstate(invalid = 'ignore'):
+        bucket_min = np.repeat(np.fmin.reduceat(values, edges[:-1]), sizes)
+        bucket_max = np.repeat(np.fmax.reduceat(values, edges[:-1]), sizes)
+
+    not_nan = np.flatnonzero(~np.isnan(values))
+    kept = [edges[:-1], edges[1:] - 1]
+    kept.append(first_in_bucket(np.flatnonzero(values == bucket_min), bucket_id))
+    kept.append(first_in_bucket(np.flatnonzero(values == bucket_max), bucket_id))
+    if len(not_nan):
+        kept.append(not_nan[[0, -1]])
+
+    return np.unique(np.concatenate(kept))
+
+
+
+def downsample_df(df, n_buckets:int):
+    """
+    Return rows of df (each column is a series, each row a period) that are needed to draw every column
+    on a chart `n_buckets` pixels wide. Rows kept for any column are kept for all columns.
+    """
+    if len(df) <= 4 * n_buckets:
+        return df
+
+    values = df.to_numpy(dtype = 'float64')
+    rows = np.unique(np.concatenate([m4_indices(values[:, i], n_buckets) for i in range(values.shape[1])]))
+    return df.iloc[rows]
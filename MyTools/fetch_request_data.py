@@ -0,0 +1,330 @@
+"""
+Fetch the datasets in config_data_request from the FRED and BEA APIs, and update data/parse_data.
+
+    - Requests run concurrently (asyncio), through one shared pool of connections (requests.Session),
+      with at most MAX_PER_HOST requests in flight per host.
+    - Failed requests (connection errors, timeouts, 429 and 5xx) are retried with exponential backoff.
+    - Only new obs are requested for a dataset that is already in data/parse_data:
+        FRED:   observation_start = the first day after the last stored period.
+        BEA:    year = every year from the year of the last stored period to the current year.
+      New obs replace stored obs of the same period (revisions) and are appended to the stored table.
+      A table is only written if the new obs change it, so an unchanged csv keeps its mtime (and the
+      caches keyed on it, see MyTools/data_cache.py).
+      A dataset that is not stored yet (or `--full`) is fetched in full and its raw response is saved
+      to data/request_data.
+    - Updated tables are recorded in data/manifest.json (see MyTools/manifest.py).
+
+API keys are read from the environment variables FRED_API_KEY and BEA_API_KEY.
+
+    python -m MyTools.fetch_request_data                    # every dataset in config_data_request
+    python -m MyTools.fetch_request_data NGDP-BEA-Q --full
+    python -m MyTools.fetch_request_data --base-url http://127.0.0.1:8765  # see MyTools/replay_server.py
+"""
+import os, csv, time, random, asyncio, logging, argparse, tempfile
+from urllib.parse import urlsplit
+import numpy as np
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+from MyTools.parse_request_data import CONFIG_DIR, REQUEST_DIR, PARSE_DIR, PATH_VARIABLE_LIST, PARSERS, \
+        load_request_config, write_parse_data, update_variable_list
+from MyTools.manifest import PATH_MANIFEST, load_manifest, save_manifest, record_parse
+from MyTools.columnar_store import PERIOD_FREQ, get_data_frequency
+from MyTools.data_cache import atomic_write
+
+
+logger = logging.getLogger(__name__)
+
+API_URLS = {
+        'FRED':'https://api.stlouisfed.org/fred/series/observations',
+        'BEA':'https://apps.bea.gov/api/data',
+        }
+API_KEYS = {
+        'FRED':('api_key', 'FRED_API_KEY'),
+        'BEA':('UserID', 'BEA_API_KEY'),
+        }
+
+MAX_PER_HOST = 4
+MAX_RETRIES = 4
+BACKOFF_SECONDS = 0.5
+TIMEOUT_SECONDS = 60
+RETRY_STATUS = {429, 500, 502, 503, 504}
+# Number of bytes written to disk at a time while downloading a response.
+DOWNLOAD_CHUNK_BYTES = 1024 * 1024
+
+
+# ~~~~~~~~~~~~~~~~~~~~~
+# Stored datasets
+# ~~~~~~~~~~~~~~~~~~~~~
+
+def read_parse_data(path_data):
+    """
+    Read a csv file in data/parse_data with its original column names (pandas renames duplicate line
+    items, e.g., Goods -> Goods.1, which would not match a newly parsed table).
+    """
+    df = pd.read_csv(path_data, dtype = {'Time':str})
+    with open(path_data, newline = '') as f:
+        df.columns = next(csv.reader(f))
+    return df
+
+
+
+def get_last_period(path_data) -> str:
+    """
+    Return the last period (e.g., 2025-08-01, 2025Q2) stored in a csv file in data/parse_data, or '' if
+    the file does not exist.
+    """
+    if not os.path.exists(path_data):
+        return ''
+    time_col = pd.read_csv(path_data, usecols = ['Time'], dtype = {'Time':str})['Time']
+    return time_col.iloc[-1] if len(time_col) else ''
+
+
+
+def get_next_period_start(last_period:str, freq:str) -> str:
+    """
+    Return the first day of the period after last_period, e.g., 2025-08-02 for 2025-08-01 (daily) or
+    2025-09-01 for 2025-08-01 (monthly). freq: D, M, Q, or A.
+    """
+    period = pd.Period(last_period, freq = PERIOD_FREQ[freq])
+    return (period + 1).start_time.strftime('%Y-%m-%d')
+
+
+
+def get_request_params(platform:str, data_info:dict, last_period:str = '', freq:str = 'D') -> dict:
+    """
+    Return the query parameters of a request. If last_period is given, only request obs after
+    last_period (FRED, freq is the frequency of the dataset) or from the year of last_period onwards (BEA).
+    """
+    params = dict(data_info['params'])
+    key_name, env_name = API_KEYS[platform]
+    if os.environ.get(env_name):
+        params[key_name] = os.environ[env_name]
+
+    if last_period and platform == 'FRED':
+        params['observation_start'] = get_next_period_start(last_period, freq)
+    elif last_period and platform == 'BEA':
+        first_year = int(last_period[:4])
+        params['year'] = ','.join(str(year) for year in range(first_year, pd.Timestamp.today().year + 1))
+
+    return params
+
+
+
+def merge_new_obs(df_stored, df_new):
+    """
+    Merge newly parsed obs into a stored table. Obs of a period in df_new replace the stored obs of
+    that period. Both tables must have the same columns.
+    """
+    df_stored = df_stored[~df_stored['Time'].isin(df_new['Time'])]
+    # Periods are ISO strings (e.g., 2025-08-01, 2025-08, 2025Q2, 2025), so sorting strings sorts periods.
+    return pd.concat([df_stored, df_new], ignore_index = True).sort_values('Time', kind = 'stable', ignore_index = True)
+
+
+
+def is_same_table(df, df_stored) -> bool:
+    """
+    Return True if df has the same periods and values (missing values included) as df_stored.
+    """
+    if df.shape != df_stored.shape or not df['Time'].equals(df_stored['Time']):
+        return False
+    values = df.drop(columns = 'Time').to_numpy(dtype = 'float64')
+    return np.array_equal(values, df_stored.drop(columns = 'Time').to_numpy(dtype = 'float64'), equal_nan = True)
+
+
+# ~~~~~~~~~~~~~~~~~~~~~
+# Fetcher
+# ~~~~~~~~~~~~~~~~~~~~~
+
+class request_fetcher():
+    """
+    Download API responses concurrently through one pool of connections.
+
+    Blocking requests run in worker threads (asyncio.to_thread), and a semaphore per host limits the
+    number of requests in flight to each host.
+    """
+    def __init__(self, max_per_host:int = MAX_PER_HOST, max_retries:int = MAX_RETRIES,
+                 backoff:float = BACKOFF_SECONDS, timeout:float = TIMEOUT_SECONDS):
+        self.max_per_host = max_per_host
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections = len(API_URLS), pool_maxsize = max_per_host)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.semaphores = {}
+
+
+    def close(self):
+        self.session.close()
+
+
+    def get_semaphore(self, url):
+        host = urlsplit(url).netloc
+        if host not in self.semaphores:
+            self.semaphores[host] = asyncio.Semaphore(self.max_per_host)
+        return self.semaphores[host]
+
+
+    def download(self, url, params:dict, path):
+        """
+        Send a GET request and stream the response body to path. Return the status code.
+        """
+        with self.session.get(url, params = params, timeout = self.timeout, stream = True) as response:
+            if response.status_code != 200:
+                return response.status_code
+
+            with atomic_write(path) as path_tmp, open(path_tmp, 'wb') as f:
+                for chunk in response.iter_content(chunk_size = DOWNLOAD_CHUNK_BYTES):
+                    f.write(chunk)
+
+            return response.status_code
+
+
+    async def fetch(self, url, params:dict, path):
+        """
+        Download the response of a request to path, retrying with exponential backoff (plus jitter).
+        """
+        async with self.get_semaphore(url):
+            for attempt in range(self.max_retries + 1):
+                try:
+                    status = await asyncio.to_thread(self.download, url, params, path)
+                except (requests.ConnectionError, requests.Timeout) as error:
+                    status, reason = None, error
+                else:
+                    if status == 200:
+                        return path
+                    reason = f'HTTP {status}'
+                    if status not in RETRY_STATUS:
+                        break
+
+                if attempt < self.max_retries:
+                    delay = self.backoff * 2 ** attempt + random.uniform(0, self.backoff)
+                    logger.warning(f'{url} failed ({reason}), retry in {delay:.1f}s')
+                    await asyncio.sleep(delay)
+
+        raise RuntimeError(f'Request to {url} failed: {reason}')
+
+
+# ~~~~~~~~~~~~~~~~~~~~~
+# Update datasets
+# ~~~~~~~~~~~~~~~~~~~~~
+
+async def update_dataset(fetcher, data_name:str, platform:str, data_info:dict, api_url, full:bool,
+                         request_dir, parse_dir) -> tuple:
+    """
+    Fetch new obs of one dataset and save the updated table to parse_dir.
+    Return (number of rows added, path of the saved raw response or None if only new obs were fetched).
+    """
+    path_data = os.path.join(parse_dir, f'{data_name}.csv')
+    last_period = '' if full else get_last_period(path_data)
+    params = get_request_params(platform, data_info, last_period, get_data_frequency(path_data) or 'D')
+
+    ###------Full history------###
+    if not last_period:
+        path_request = await fetcher.fetch(api_url, params, os.path.join(request_dir, f'{data_name}.json'))
+        df = await asyncio.to_thread(PARSERS[platform], path_request, data_info)
+        await asyncio.to_thread(write_parse_data, df, path_data)
+        return len(df), path_request
+
+    ###------New obs only------###
+    fd, path_request = tempfile.mkstemp(prefix = f'{data_name}-', suffix = '.json', dir = request_dir)
+    os.close(fd)
+    try:
+        await fetcher.fetch(api_url, params, path_request)
+        df_new = await asyncio.to_thread(PARSERS[platform], path_request, data_info)
+    finally:
+        os.remove(path_request)
+
+    df_stored = read_parse_data(path_data)
+    if df_new.columns.to_list() != df_stored.columns.to_list():
+        # e.g., BEA added a line item to the table. Rebuild the whole table.
+        logger.warning(f'Columns of {data_name} changed, fetching the full history.')
+        return await update_dataset(fetcher, data_name, platform, data_info, api_url, True, request_dir, parse_dir)
+
+    df = merge_new_obs(df_stored, df_new)
+    if is_same_table(df, df_stored):
+        # Nothing new: the csv is not rewritten, so its mtime (the version of every cache built on it) is kept.
+        return 0, None
+    await asyncio.to_thread(write_parse_data, df, path_data)
+    return len(df) - len(df_stored), None
+
+
+
+async def update_datasets(data_name_list:list, api_urls:dict, full:bool, config_dir, request_dir, parse_dir,
+                          max_per_host:int) -> dict:
+    config = load_request_config(config_dir)
+    fetcher = request_fetcher(max_per_host = max_per_host)
+    try:
+        tasks = [
+                update_dataset(fetcher, data_name, *config[data_name], api_urls[config[data_name][0]], full, request_dir, parse_dir)
+                for data_name in data_name_list
+                ]
+        results = await asyncio.gather(*tasks, return_exceptions = True)
+    finally:
+        fetcher.close()
+
+    return dict(zip(data_name_list, results))
+
+
+
+def update_request_data(data_name_list:list = None, base_url:str = '', full:bool = False, config_dir = CONFIG_DIR,
+                        request_dir = REQUEST_DIR, parse_dir = PARSE_DIR, path_variable_list = PATH_VARIABLE_LIST,
+                        path_manifest = PATH_MANIFEST, max_per_host:int = MAX_PER_HOST) -> dict:
+    """
+    This function fetches datasets in data_name_list (all datasets in config_dir by default) and updates
+    their tables in parse_dir.
+
+    base_url: if given (e.g., http://127.0.0.1:8765), send requests to this host instead of the real APIs.
+
+    Return {<data_name>: <number of rows added, or the exception raised>}.
+    """
+    config = load_request_config(config_dir)
+    data_name_list = data_name_list or list(config)
+    api_urls = API_URLS
+    if base_url:
+        api_urls = {platform:base_url.rstrip('/') + urlsplit(url).path for platform, url in API_URLS.items()}
+
+    results = asyncio.run(update_datasets(data_name_list, api_urls, full, config_dir, request_dir, parse_dir, max_per_host))
+
+    updated = {data_name:(config[data_name][0], config[data_name][1]['name'])
+               for data_name, result in results.items() if not isinstance(result, Exception)}
+
+    ###------Record updated tables------###
+    # A table updated with new obs only is recorded without its raw response, so the older full response
+    # in request_dir is not parsed over it later.
+    manifest = load_manifest(path_manifest)
+    for data_name in updated:
+        _, path_request = results[data_name]
+        data_info = config[data_name][1] if path_request else None
+        record_parse(manifest, data_name, os.path.join(parse_dir, f'{data_name}.csv'), path_request, data_info)
+    if updated:
+        save_manifest(manifest, path_manifest)
+    if updated and path_variable_list:
+        update_variable_list(updated, path_variable_list)
+
+    return {data_name:result if isinstance(result, Exception) else result[0] for data_name, result in results.items()}
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Fetch new obs from FRED and BEA and update data/parse_data.')
+    parser.add_argument('data_names', nargs = '*', help = 'Data names, e.g., NGDP-BEA-Q. Default: every dataset in config_data_request.')
+    parser.add_argument('--full', action = 'store_true', help = 'Fetch the full history instead of new obs only.')
+    parser.add_argument('--base-url', default = '', help = 'Send requests to this host, e.g., a replay server.')
+    parser.add_argument('--max-per-host', type = int, default = MAX_PER_HOST)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = update_request_data(args.data_names, args.base_url, args.full, max_per_host = args.max_per_host)
+    for data_name, result in results.items():
+        print(f'{data_name}: {"failed, " + str(result) if isinstance(result, Exception) else f"{result} rows added"}')
+    print(f'Done in {time.perf_counter() - start:.1f}s')
+
+
+
+if __name__ == '__main__':
+    main()
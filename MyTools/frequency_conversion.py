@@ -1,7 +1,29 @@
+import os
+import numpy as np
 import pandas as pd
 from pathlib import Path
 import streamlit as st
 
+from MyTools.data_cache import memory_cache, get_file_version, set_read_only
+from MyTools.columnar_store import read_columnar, write_columnar
+from MyTools.load_data import load_dataset
+from MyTools.period_align import get_group_starts, reduce_groups
+from MyTools import profiler
+
+
+# ~~~~~~~~~~~~~~~~~~~~~
+# Rollup cache
+# ~~~~~~~~~~~~~~~~~~~~~
+# Frequency conversions (rollups) of a dataset are computed once per version of the source file, saved
+# to data/parse_data/rollup/<data_name>-<target_frequency>.parquet and shared by every session.
+ROLLUP_DIR = 'rollup'
+# Version of the conversion algorithm, saved in the version of every rollup. Change it whenever
+# `convert_frequency` changes the values it returns, so rollups saved by the previous code are rebuilt.
+ROLLUP_ALGORITHM = 'period-codes-2'
+ROLLUP_FREQUENCIES = ['M', 'Q', 'A']
+ROLLUP_CACHE_MAX_BYTES = 128 * 1024 * 1024
+rollup_cache = memory_cache(max_bytes = ROLLUP_CACHE_MAX_BYTES)
+
 
 def parse_BEA_month(time_col):
     """
@@ -27,13 +49,26 @@ def determine_frequency(path_data: str) -> str:
 
 
 
+def get_period_codes(time_col, freq:str):
+    """
+    Return the ordinals of the periods of frequency freq (e.g., 'Q') that the values of a Time column
+    (periods, datetimes or date strings) fall in.
+    """
+    if isinstance(time_col.dtype, pd.PeriodDtype):
+        return time_col.array.asfreq(freq).asi8
+    return pd.to_datetime(time_col).dt.to_period(freq).array.asi8
+
+
+
 #def convert_frequency(path_data:str, target_frequency:str):
-def convert_frequency(raw_data, target_frequency:str):
+def convert_frequency(raw_data, target_frequency:str, how = 'mean'):
     """
     This function can do the following conversion:
-        1. from monthly to quarterly or anual data
-        2. from quarterly to anual data.
-    Then it return the new df in which Time is the first column.
+        1. from daily to monthly, quarterly or anual data
+        2. from monthly to quarterly or anual data
+        3. from quarterly to anual data.
+    Then it return the new df in which Time is the first column. It covers every period between the first
+    and the last obs; periods without obs are NaN (0 for sum). Values are rounded to 2 digits.
 
     target_frequency:  Frequency you would like to convert the data to.
                         "MS", month start;
@@ -42,22 +77,113 @@ def convert_frequency(raw_data, target_frequency:str):
                         "QE",
                         "AS",
                         "AE",...
+    how:    an aggregator in AGGREGATORS of MyTools/period_align.py (mean, sum, first, last, min, max), or a list of them.
+            first and last are the first and last obs of each period (missing obs are skipped), e.g., 'last'
+            is the end-of-period value of a rate.
+            With a list, columns are named <column> (<aggregator>), grouped by aggregator, e.g., with
+            how = ['mean', 'last']: FFER (mean), IORB (mean), FFER (last), IORB (last).
+
+    Period codes are computed once and every aggregator reduces all columns in one vectorized pass over
+    the sorted groups (see `reduce_groups`). raw_data is not modified.
+    Means and sums are compensated sums, as in pandas, so they are the same as resample().mean() and
+    resample().sum(), bit for bit.
+    """
+    how_list = [how] if isinstance(how, str) else list(how)
+    # If target_frequency = "QS", then freq = 'Q', etc.
+    freq = target_frequency[0]
+
+    cols = raw_data.columns.drop('Time')
+    values = raw_data[cols].to_numpy(dtype = 'float64')
+    codes = get_period_codes(raw_data['Time'], freq)
+    if len(codes) > 1 and not (codes[1:] >= codes[:-1]).all():
+        order = np.argsort(codes, kind = 'stable')
+        codes, values = codes[order], values[order]
+
+    ###------Reduce each period------###
+    starts = get_group_starts(codes)
+    # Row of each period in the result, which covers every period between the first and the last obs.
+    first = codes[0] if len(codes) else 0
+    n_periods = int(codes[-1] - first + 1) if len(codes) else 0
+    rows = codes[starts] - first
+
+    blocks = []
+    for one_how in how_list:
+        block = np.full((n_periods, len(cols)), 0.0 if one_how == 'sum' else np.nan)
+        block[rows] = reduce_groups(values, starts, one_how)
+        blocks.append(block)
+
+    if len(how_list) == 1:
+        names = cols.to_list()
+    else:
+        names = [f'{col} ({one_how})' for one_how in how_list for col in cols]
+
+    df = pd.DataFrame(np.hstack(blocks).round(2), columns = names)
+    df.insert(0, 'Time', pd.PeriodIndex.from_ordinals(np.arange(first, first + n_periods), freq = freq))
+
+    return df
+
 
 
+def get_rollup_path(path_data, target_frequency:str, how:str = 'mean'):
     """
-    #raw_data = pd.read_csv(path_data)
-    raw_data['Time'] = pd.to_datetime(raw_data['Time'])
-    # resample to target frequency
-    df = raw_data.resample(target_frequency, on = 'Time').mean()
-    # If target_frequency = "QS", then freq = 'Q', etc.
-    df_t = pd.PeriodIndex(df.index, freq = target_frequency[0]).to_frame().reset_index(drop = True)
-    df = df.reset_index(drop = True)
-    df = pd.concat([df_t, df], axis = 1).round(2)
+    Return the path of a rollup file.
+    If path_data = './parse_data/FFER-FRED-D.csv' and target_frequency = 'M', return './parse_data/rollup/FFER-FRED-D-M.parquet'
+    (or './parse_data/rollup/FFER-FRED-D-M-last.parquet' for how = 'last').
+    """
+    path_data = Path(path_data)
+    suffix = target_frequency if how == 'mean' else f'{target_frequency}-{how}'
+    return str(path_data.parent / ROLLUP_DIR / f'{path_data.stem}-{suffix}.parquet')
 
-    print(df)
 
 
-    return df
+def load_rollup(path_data, target_frequency:str, how:str = 'mean'):
+    """
+    This function returns the dataset in path_data converted to target_frequency with the aggregator how
+    (see `convert_frequency`).
+
+    A rollup is computed only when it is missing or when the source file or the conversion has changed: the
+    version (mtime, size) of the source file and ROLLUP_ALGORITHM are saved with the rollup, in memory and in
+    the rollup file, and a rollup saved under a different version is recomputed.
+
+    As `load_dataset`, each caller receives a shallow copy of the cached (read-only) df.
+    """
+    path_data = os.path.abspath(path_data)
+    with profiler.stage('load_rollup', name = f'{Path(path_data).stem}-{target_frequency}', how = how) as record:
+        version = (*get_file_version(path_data), ROLLUP_ALGORITHM)
+        key = (path_data, target_frequency, how)
+
+        df = rollup_cache.get(key, version)
+        record['cache'] = 'miss' if df is None else 'hit'
+        if df is None:
+            path_rollup = get_rollup_path(path_data, target_frequency, how)
+            df = read_columnar(path_rollup, version)
+            if df is None:
+                raw_data = load_dataset(path_data)
+                with profiler.stage('convert_frequency', name = target_frequency, rows = len(raw_data)):
+                    df = convert_frequency(raw_data, target_frequency, how)
+                try:
+                    os.makedirs(os.path.dirname(path_rollup), exist_ok = True)
+                    write_columnar(df, path_rollup, version)
+                except OSError:
+                    # e.g., read-only file system. The rollup is still cached in memory.
+                    pass
+            df = rollup_cache.put(key, set_read_only(df), version)
+        record['rows'] = len(df)
+
+        return df.copy(deep = False)
+
+
+
+def build_rollups(data_dir, frequencies:list = ROLLUP_FREQUENCIES):
+    """
+    This function builds the monthly, quarterly and annual rollups of every daily dataset (<data_name>-D.csv) in data_dir.
+    """
+    for path_data in sorted(Path(data_dir).glob('*-D.csv')):
+        for target_frequency in frequencies:
+            load_rollup(path_data, target_frequency)
+        print(f'Rolled up {path_data.name}')
 
 
 
+if __name__ == '__main__':
+    build_rollups(os.path.join('data', 'parse_data'))
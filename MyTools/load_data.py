@@ -1,58 +1,40 @@
-import pandas as pd
-import numpy as np
-import streamlit as st
-
-def load_dataset(path_data):
-    df = pd.read_csv(path_data)
-
-    return df
-
-
-
-
-def get_percentage_share_GDP(df, denominator:str):
-    """
-    Gross domestic product
-    Compute % share through [each col]/denominator, except for the Time column.
-    """
-    result = df[['Time']]
-    base = df[denominator]
+import os
 
+from MyTools.data_cache import memory_cache, get_file_version, set_read_only
+from MyTools.columnar_store import read_dataset
+from MyTools import profiler
 
-    for col in df.columns:
-        if col != 'Time':
-            result[col] = (df[col]/base) * 100
 
+# ~~~~~~~~~~~~~~~~~~~~~
+# Dataset cache
+# ~~~~~~~~~~~~~~~~~~~~~
+# Parsed datasets are shared by every session in the server process.
+# A dataset is parsed once and parsed again only when its file on disk changes.
+DATASET_CACHE_MAX_BYTES = 512 * 1024 * 1024
+dataset_cache = memory_cache(max_bytes = DATASET_CACHE_MAX_BYTES)
 
-    return result.round(2)
 
-
-
-def get_rgdp(df, p):
+def load_dataset(path_data):
     """
-    This function compute and return a df contains RGDP using NGDP (df) and GDP deflator (p).
-
-    df: a df contains NGDP (quarterly, or annual data)
-    p:  a df contains the corresponding GDP deflator
+    Return the dataset saved in path_data. Time is a typed period column and other columns are float64.
+    If a fresh columnar copy (<data_name>.parquet) exists next to the csv file, it is read instead of the csv.
+    See MyTools/columnar_store.py.
 
-    Note:
-        1. Real Net export = real export - real import
-        2. This function will not compute real `change in private inventories`.
+    The parsed df is saved in a process-wide cache keyed on the file path and its mtime, so a dataset
+    is only parsed when it is requested for the first time or when the file has been modified.
 
+    Each caller receives a shallow copy of the cached df: adding or replacing columns (e.g., converting
+    Time to string) only changes the caller's copy. The cached arrays are read-only (see `set_read_only`),
+    so writing values in place raises an error instead of changing the dataset of every session.
     """
-    
-    rgdp = pd.DataFrame({'Time':df['Time'].values})
-    # start from the second items since the first is Time.
-    for col in df.columns.to_list()[1:]:
-        try:
-            rgdp[col] = df[col]/p[col] * 100
-        except:
-            rgdp[col] = np.nan
-
-    rgdp['Net exports of goods and services'] = rgdp['Exports'] - rgdp['Imports']
-
-
-    return rgdp
-
+    path_data = os.path.abspath(path_data)
+    with profiler.stage('load_dataset', name = os.path.basename(path_data)) as record:
+        version = get_file_version(path_data)
 
+        df = dataset_cache.get(path_data, version)
+        record['cache'] = 'miss' if df is None else 'hit'
+        if df is None:
+            df = dataset_cache.put(path_data, set_read_only(read_dataset(path_data, version)), version)
+        record['rows'] = len(df)
 
+        return df.copy(deep = False)
@@ -0,0 +1,163 @@
+"""
+A manifest (data/manifest.json) that records, for each dataset, the state of its raw response in
+data/request_data and of its parsed table in data/parse_data:
+
+    {
+        "NGDP-BEA-Q": {
+            "request": {"hash": ..., "version": [mtime_ns, size], "rows": 314,
+                        "first_period": "1947Q1", "last_period": "2025Q2"},
+            "config": <hash of its entry in config_data_request>,
+            "parse": {"hash": ..., "version": [mtime_ns, size], "rows": 314,
+                      "first_period": "1947Q1", "last_period": "2025Q2", "updated": "2025-12-14T18:30:00"}
+        },
+        ...
+    }
+
+    - `needs_parse` tells whether a dataset must be parsed again: its raw response (content hash) or its
+      config changed, or its parsed table is missing or was modified since it was recorded.
+      Content hashes are only recomputed when the (mtime, size) of a file changes.
+    - `get_parse_info` returns the rows, first and last period of a parsed table without opening it, or
+      None if the table changed since it was recorded.
+
+    python -m MyTools.manifest          # show the state of every dataset in the manifest
+"""
+import os, json, hashlib, argparse
+import pandas as pd
+
+from MyTools.data_cache import get_file_version, atomic_write
+
+
+PATH_MANIFEST = os.path.join('data', 'manifest.json')
+HASH_CHUNK_BYTES = 1024 * 1024
+
+
+def get_file_hash(path) -> str:
+    """
+    Return the blake2b hash of the content of a file, read HASH_CHUNK_BYTES at a time.
+    """
+    h = hashlib.blake2b(digest_size = 16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+
+def get_config_hash(data_info:dict) -> str:
+    return hashlib.blake2b(json.dumps(data_info, sort_keys = True).encode(), digest_size = 16).hexdigest()
+
+
+
+def load_manifest(path_manifest = PATH_MANIFEST) -> dict:
+    if not os.path.exists(path_manifest):
+        return {}
+    with open(path_manifest) as f:
+        return json.load(f)
+
+
+
+def save_manifest(manifest:dict, path_manifest = PATH_MANIFEST):
+    """
+    Save the manifest. The file is written to a temporary path first, so readers never see a partially
+    written file.
+    """
+    with atomic_write(path_manifest) as path_tmp, open(path_tmp, 'w') as f:
+        json.dump(manifest, f, indent = 4, sort_keys = True)
+
+
+
+def get_file_record(path, record:dict = None) -> dict:
+    """
+    Return {'hash':..., 'version':[mtime_ns, size]} of a file. If the version of the file matches
+    `record` (a previous file record), its hash is reused instead of reading the file.
+    """
+    version = list(get_file_version(path))
+    if record and record.get('version') == version:
+        return {'hash':record['hash'], 'version':version}
+    return {'hash':get_file_hash(path), 'version':version}
+
+
+
+def is_file_unchanged(path, record:dict) -> bool:
+    """
+    Return True if the file exists and its content matches a file record.
+    """
+    if not record or not os.path.exists(path):
+        return False
+    return get_file_record(path, record)['hash'] == record['hash']
+
+
+
+def needs_parse(manifest:dict, data_name:str, path_request, path_data, data_info:dict) -> bool:
+    """
+    Return True if the raw response of data_name must be parsed (again) to produce path_data.
+    """
+    entry = manifest.get(data_name)
+    if not entry or entry.get('config') != get_config_hash(data_info):
+        return True
+    return not (is_file_unchanged(path_request, entry.get('request')) and is_file_unchanged(path_data, entry.get('parse')))
+
+
+
+def record_parse(manifest:dict, data_name:str, path_data, path_request = None, data_info:dict = None):
+    """
+    Record the state of a parsed table (and, if given, of the raw response and config it was parsed from).
+    Rows, first and last period are read from the Time column of the table.
+
+    A raw response is only recorded when the table was just parsed from the whole response, so the rows,
+    first and last period of the response are the same as those of the table.
+    """
+    entry = manifest.setdefault(data_name, {})
+    time_col = pd.read_csv(path_data, usecols = ['Time'], dtype = {'Time':str})['Time']
+    period_info = {
+            'rows':len(time_col),
+            'first_period':time_col.iloc[0] if len(time_col) else '',
+            'last_period':time_col.iloc[-1] if len(time_col) else '',
+            }
+
+    entry['parse'] = {
+            **get_file_record(path_data),
+            **period_info,
+            'updated':pd.Timestamp.now().isoformat(timespec = 'seconds'),
+            }
+    if path_request is not None:
+        entry['request'] = {**get_file_record(path_request, entry.get('request')), **period_info}
+    if data_info is not None:
+        entry['config'] = get_config_hash(data_info)
+
+    return entry
+
+
+
+def get_parse_info(data_name:str, path_data, manifest:dict = None, path_manifest = PATH_MANIFEST):
+    """
+    Return the manifest record (rows, first_period, last_period, updated, ...) of the parsed table of
+    data_name, without opening the table. Only the (mtime, size) of the table is checked, so return None
+    if the table is missing, not recorded, or changed since it was recorded.
+    """
+    manifest = load_manifest(path_manifest) if manifest is None else manifest
+    record = manifest.get(data_name, {}).get('parse')
+    if not record or not os.path.exists(path_data) or list(get_file_version(path_data)) != record['version']:
+        return None
+    return record
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Show the state of datasets recorded in data/manifest.json.')
+    parser.add_argument('--manifest', default = PATH_MANIFEST)
+    parser.add_argument('--parse-dir', default = os.path.join('data', 'parse_data'))
+    args = parser.parse_args()
+
+    manifest = load_manifest(args.manifest)
+    for data_name in sorted(manifest):
+        record = get_parse_info(data_name, os.path.join(args.parse_dir, f'{data_name}.csv'), manifest)
+        if record is None:
+            print(f'{data_name:<25} changed since recorded')
+        else:
+            print(f'{data_name:<25} {record["rows"]:>7} rows  {record["first_period"]} - {record["last_period"]}  (updated {record["updated"]})')
+
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+
+from MyTools.load_data import load_dataset
+from MyTools.frequency_conversion import load_rollup
+from MyTools import profiler
+
+
+# Number of datasets loaded at the same time.
+MERGE_MAX_WORKERS = 8
+
+
+def load_datasets(path_list:list, target_freq = '', how:str = 'mean'):
+    """
+    Load datasets in path_list (or their rollups in target_freq, see `load_rollup`) concurrently. Return a
+    list of df, in the order of path_list.
+    """
+    def load(path, collector):
+        # Stages of worker threads are recorded with the collector of the run (see MyTools/profiler.py).
+        with profiler.collect(collector):
+            return load_rollup(path, target_freq, how) if target_freq else load_dataset(path)
+
+    collector = profiler.get_collector()
+    if len(path_list) == 1:
+        return [load(path_list[0], collector)]
+
+    with ThreadPoolExecutor(max_workers = min(len(path_list), MERGE_MAX_WORKERS)) as executor:
+        return list(executor.map(load, path_list, [collector] * len(path_list)))
+
+
+
+def get_period_keys(df, path):
+    """
+    Return the period ordinals of the Time column (a typed period column) of a dataset, its values as a 2-D
+    float64 array (in the order of the ordinals), its columns (except Time) and its frequency.
+    """
+    time_col = df['Time']
+    keys = time_col.array.asi8
+    cols = df.columns.drop('Time')
+    values = df[cols].to_numpy(dtype = 'float64')
+    if len(keys) > 1 and not (keys[1:] > keys[:-1]).all():
+        order = np.argsort(keys, kind = 'stable')
+        keys, values = keys[order], values[order]
+        if (keys[1:] == keys[:-1]).any():
+            raise ValueError(f'{path} has more than one row for the same period.')
+
+    return keys, values, cols, time_col.dtype.freq
+
+
+
+def merge_data_df(data_name_list:list, target_freq = '', data_dir = os.path.join('data', 'parse_data'), how:str = 'mean'):
+    """
+    For each data_name in data_name_list:
+        1. Load corresponding df named <data_name.csv> in directory data_dir (through the shared dataset cache).
+            -- Datasets are loaded concurrently.
+        2. Merge all dfs.
+            -- You must make sure that data in all dfs are measured in the same frequency, such as daily, monthly, quarterly...
+        3. If target_freq is given (e.g., 'M'), merge the rollup of each df in target_freq instead (see `load_rollup`).
+            -- how: the aggregator of rollups, e.g., 'mean' (average of the period) or 'last' (end of period).
+
+    Datasets are merged on period ordinals (integers): the Time columns of all datasets, each sorted already,
+    are merged into one sorted union of periods, and values are written to one preallocated block, so the
+    cost grows linearly with the number of datasets.
+
+    Return:
+        without target_freq: a df indexed by Time (datetime, or periods if they do not fit in the datetime
+                             range), with a Time column as the last column.
+        with target_freq: a df with Time (periods) as the first column, covering every period between the
+                          first and the last obs (periods without obs are NaN), as `convert_frequency` does.
+    """
+    with profiler.stage('merge_data_df', name = f'{len(data_name_list)} datasets, {target_freq or "original frequency"}') as record:
+        path_list = [os.path.join(data_dir, f'{data_name}.csv') for data_name in data_name_list]
+
+        # With target_freq, merge the precomputed rollups of each dataset, instead of converting the merged df on every render.
+        series = [get_period_keys(df, path) for df, path in zip(load_datasets(path_list, target_freq, how), path_list)]
+        keys_list, values_list, cols_list, freq_list = zip(*series)
+        freq = freq_list[0]
+        if any(i != freq for i in freq_list):
+            raise ValueError(f'Datasets {data_name_list} are not measured in the same frequency.')
+
+        ###------Union of periods------###
+        all_keys = np.concatenate(keys_list)
+        if target_freq:
+            # Every period between the first and the last obs.
+            union = np.arange(all_keys.min(), all_keys.max() + 1, dtype = 'int64')
+        else:
+            # Each array of keys is a sorted run, so a stable sort (timsort) merges the runs in one pass.
+            union = np.sort(all_keys, kind = 'stable')
+            union = union[np.concatenate([[True], union[1:] != union[:-1]])]
+
+        ###------Assemble the block once------###
+        block = np.full((len(union), sum(values.shape[1] for values in values_list)), np.nan)
+        start = 0
+        for keys, values in zip(keys_list, values_list):
+            block[np.searchsorted(union, keys), start:start + values.shape[1]] = values
+            start += values.shape[1]
+
+        time_index = pd.PeriodIndex.from_ordinals(union, freq = freq, name = 'Time')
+        cols = [col for cols in cols_list for col in cols]
+        record['rows'] = len(union)
+
+        if target_freq:
+            result = pd.DataFrame(block, columns = cols, copy = False)
+            result.insert(0, 'Time', time_index)
+            return result
+
+        # Convert "Time" index (periods) to datetime type. Periods beyond the datetime range (1678-2262) are kept.
+        try:
+            time_index = time_index.to_timestamp()
+        except pd.errors.OutOfBoundsDatetime:
+            pass
+        result = pd.DataFrame(block, index = time_index, columns = cols, copy = False)
+        result['Time'] = result.index
+
+        return result
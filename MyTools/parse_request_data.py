@@ -0,0 +1,264 @@
+"""
+Parse the raw responses in data/request_data to the tables in data/parse_data.
+
+Each dataset is described in config_data_request/FRED.json or config_data_request/BEA.json:
+    - name:         name of the variable (the column name of a FRED series, and the name listed in
+                    variables_in_database.csv).
+    - drop_cols:    (BEA) line items to leave out of the table, e.g., ["Residual"].
+    - MnToBn:       (BEA) if true, convert values from millions to billions.
+
+Raw responses can be several MB. Records in `observations` (FRED) and `BEAAPI.Results.Data` (BEA)
+are decoded one at a time from a buffered reader, and only the fields needed for the table are kept.
+Values are converted to float64 in bulk and BEA line items are pivoted to columns in one vectorized step.
+
+Each parsed table is saved as <data_name>.csv (and its parquet copy, see MyTools/columnar_store.py).
+A dataset is only parsed again if its raw response or its config changed since the last run, as recorded
+in data/manifest.json (see MyTools/manifest.py):
+
+    python -m MyTools.parse_request_data                  # every dataset in config_data_request
+    python -m MyTools.parse_request_data NGDP-BEA-Q FFER-FRED-D
+    python -m MyTools.parse_request_data --force          # parse every raw response again
+"""
+import os, re, json, argparse
+import numpy as np
+import pandas as pd
+
+from MyTools.data_cache import get_file_version, atomic_write
+from MyTools.columnar_store import read_csv_dataset, get_columnar_path, write_columnar
+from MyTools.manifest import PATH_MANIFEST, load_manifest, save_manifest, needs_parse, record_parse
+
+
+CONFIG_DIR = 'config_data_request'
+REQUEST_DIR = os.path.join('data', 'request_data')
+PARSE_DIR = os.path.join('data', 'parse_data')
+PATH_VARIABLE_LIST = 'variables_in_database.csv'
+PLATFORMS = ['FRED', 'BEA']
+
+# Number of characters read from a raw response at a time.
+CHUNK_SIZE = 1024 * 1024
+# Number of rows written to a csv file at a time.
+WRITE_CHUNK_ROWS = 50000
+
+
+# ~~~~~~~~~~~~~~~~~~~~~
+# Streaming json reader
+# ~~~~~~~~~~~~~~~~~~~~~
+
+def iter_json_array(path_json, key:str, chunk_size:int = CHUNK_SIZE):
+    """
+    This function yields the items of the first array stored under `key` in a json file, one at a time.
+    For instance, key = 'observations' yields each obs of a FRED response.
+
+    The file is read `chunk_size` characters at a time, so only the current chunk and the current item
+    are held in memory. Items must be json objects (or arrays), which is the case for FRED and BEA.
+    """
+    decoder = json.JSONDecoder()
+    pattern = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+
+    with open(path_json, 'r', encoding = 'utf-8') as f:
+        ###------Find the start of the array------###
+        buffer = ''
+        while True:
+            chunk = f.read(chunk_size)
+            buffer += chunk
+            match = pattern.search(buffer)
+            if match:
+                buffer = buffer[match.end():]
+                break
+            if not chunk:
+                raise ValueError(f'{path_json} has no array named "{key}".')
+            # Keep the tail, in case the key is split across two chunks.
+            buffer = buffer[-(len(key) + 64):]
+
+        ###------Decode items------###
+        pos = 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                pos += 1
+
+            if pos < len(buffer) and buffer[pos] == ']':
+                return
+
+            try:
+                if pos == len(buffer):
+                    raise json.JSONDecodeError('Need more data', buffer, pos)
+                item, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # The item is incomplete, read the next chunk.
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    raise ValueError(f'Array "{key}" in {path_json} is truncated.')
+                buffer = buffer[pos:] + chunk
+                pos = 0
+                continue
+
+            yield item
+
+
+
+def to_float_array(values:list):
+    """
+    Convert value strings (e.g., '1.250', '3,200,758', '.') to a float64 array. Missing values become NaN.
+    """
+    values = pd.Series(values, dtype = 'object').str.replace(',', '', regex = False)
+    return pd.to_numeric(values, errors = 'coerce').to_numpy(dtype = 'float64')
+
+
+# ~~~~~~~~~~~~~~~~~~~~~
+# Parsers
+# ~~~~~~~~~~~~~~~~~~~~~
+
+def parse_FRED(path_request, data_info:dict):
+    """
+    This function parses a FRED response (series observations) to a df with two columns, Time and <col_name>.
+    col_name (optional, <name> by default): the header of the value column. The observations response does not
+    carry the series title, so col_name keeps the title used in data/parse_data (e.g., "Federal Funds Target
+    Rate (DISCONTINUED)"), which charts use as legend and as key of line formats.
+    """
+    dates, values = [], []
+    for obs in iter_json_array(path_request, 'observations'):
+        dates.append(obs['date'])
+        values.append(obs['value'])
+
+    return pd.DataFrame({'Time':dates, data_info.get('col_name', data_info['name']):to_float_array(values)})
+
+
+
+def parse_BEA(path_request, data_info:dict):
+    """
+    This function parses a BEA response (a NIPA table) to a df in which each row refers to a period and
+    each column refers to a line item, in the order of line numbers. Line items in drop_cols are dropped.
+    Monthly periods (e.g., 2025M01) are written as 2025-01.
+    """
+    line_numbers, descriptions, periods, values = [], [], [], []
+    for record in iter_json_array(path_request, 'Data'):
+        line_numbers.append(int(record['LineNumber']))
+        descriptions.append(record['LineDescription'])
+        periods.append(record['TimePeriod'])
+        values.append(record['DataValue'])
+
+    values = to_float_array(values)
+    if data_info.get('MnToBn'):
+        values = values / 1000
+
+    ###------Pivot line items to columns------###
+    line_codes, line_labels = pd.factorize(np.array(line_numbers), sort = True)
+    period_codes, period_labels = pd.factorize(np.array(periods), sort = True)
+
+    table = np.full((len(period_labels), len(line_labels)), np.nan)
+    table[period_codes, line_codes] = values
+
+    # Description of each line item, taken from its first record.
+    _, first_record = np.unique(line_codes, return_index = True)
+    cols = np.array(descriptions, dtype = 'object')[first_record]
+
+    keep = ~np.isin(cols, data_info.get('drop_cols', []))
+    df = pd.DataFrame(table[:, keep], columns = cols[keep])
+    df.insert(0, 'Time', pd.Series(period_labels).str.replace('M', '-', regex = False))
+
+    return df
+
+
+
+PARSERS = {
+        'FRED':parse_FRED,
+        'BEA':parse_BEA,
+        }
+
+
+# ~~~~~~~~~~~~~~~~~~~~~
+# Write tables
+# ~~~~~~~~~~~~~~~~~~~~~
+
+def write_parse_data(df, path_data):
+    """
+    Save a parsed table to a csv file (WRITE_CHUNK_ROWS rows at a time), then save its parquet copy.
+    The csv file is written to a temporary path first, so readers never see a partially written file.
+
+    The parquet copy is built from the csv file, as `load_dataset` would read it (e.g., duplicate line
+    items such as Goods are renamed to Goods.1, Goods.2).
+    """
+    with atomic_write(path_data) as path_tmp:
+        df.to_csv(path_tmp, index = False, chunksize = WRITE_CHUNK_ROWS)
+
+    write_columnar(read_csv_dataset(path_data), get_columnar_path(path_data), get_file_version(path_data))
+
+
+
+def update_variable_list(parsed:dict, path_variable_list = PATH_VARIABLE_LIST):
+    """
+    Add (or update) parsed datasets in variables_in_database.csv.
+    parsed: {<data_name>: (<platform>, <name>)}
+    """
+    df = pd.read_csv(path_variable_list, index_col = 0)
+    for data_name, (platform, name) in parsed.items():
+        df.loc[data_name] = [name, platform, data_name.split('-')[-1]]
+
+    df.to_csv(path_variable_list)
+
+
+
+def load_request_config(config_dir = CONFIG_DIR) -> dict:
+    """
+    Return {<data_name>: (<platform>, <data_info>)} for every dataset in config_data_request.
+    """
+    config = {}
+    for platform in PLATFORMS:
+        with open(os.path.join(config_dir, f'{platform}.json')) as f:
+            for data_name, data_info in json.load(f).items():
+                config[data_name] = (platform, data_info)
+
+    return config
+
+
+
+def parse_request_data(data_name_list:list = None, config_dir = CONFIG_DIR, request_dir = REQUEST_DIR,
+                       parse_dir = PARSE_DIR, path_variable_list = PATH_VARIABLE_LIST,
+                       path_manifest = PATH_MANIFEST, force:bool = False):
+    """
+    This function parses the raw responses of datasets in data_name_list (all datasets in config_dir by
+    default) to parse_dir. Datasets without a raw response in request_dir are skipped, and so are
+    datasets whose raw response and config did not change since they were last parsed (unless force).
+    Return a list of parsed data names.
+    """
+    config = load_request_config(config_dir)
+    data_name_list = data_name_list or list(config)
+    manifest = load_manifest(path_manifest)
+
+    parsed = {}
+    for data_name in data_name_list:
+        platform, data_info = config[data_name]
+        path_request = os.path.join(request_dir, f'{data_name}.json')
+        path_data = os.path.join(parse_dir, f'{data_name}.csv')
+        if not os.path.exists(path_request):
+            continue
+        if not force and not needs_parse(manifest, data_name, path_request, path_data, data_info):
+            continue
+
+        df = PARSERS[platform](path_request, data_info)
+        write_parse_data(df, path_data)
+        record_parse(manifest, data_name, path_data, path_request, data_info)
+        parsed[data_name] = (platform, data_info['name'])
+
+    if parsed:
+        save_manifest(manifest, path_manifest)
+    if parsed and path_variable_list:
+        update_variable_list(parsed, path_variable_list)
+
+    return list(parsed)
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Parse raw responses in data/request_data to data/parse_data.')
+    parser.add_argument('data_names', nargs = '*', help = 'Data names, e.g., NGDP-BEA-Q. Default: every dataset in config_data_request.')
+    parser.add_argument('--force', action = 'store_true', help = 'Parse raw responses even if they did not change.')
+    args = parser.parse_args()
+
+    for data_name in parse_request_data(args.data_names, force = args.force):
+        print(f'Parsed {data_name}')
+
+
+
+if __name__ == '__main__':
+    main()
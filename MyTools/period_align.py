@@ -0,0 +1,165 @@
+import numpy as np
+import pandas as pd
+
+from MyTools.time_index import get_time_keys
+
+
+# ~~~~~~~~~~~~~~~~~~~~~
+# Period alignment engine
+# ~~~~~~~~~~~~~~~~~~~~~
+# Series of different frequencies (daily, monthly, quarterly, annual) are aligned on integer period
+# ordinals (pd.Period.ordinal) instead of string labels:
+#     - same frequency:       rows are matched by ordinal.
+#     - higher frequency:     (e.g., daily policy rates over quarterly GDP growth) obs are grouped by the
+#                             period of the target they fall in, and reduced by an aggregator (mean, last, ...).
+#     - lower frequency:      (e.g., quarterly GDP growth over monthly data) each target period takes the value
+#                             of the period it falls in.
+AGGREGATORS = ['mean', 'sum', 'first', 'last', 'min', 'max']
+
+
+def get_group_starts(codes):
+    """
+    Return the row position where each group starts, given sorted group codes, e.g., [5, 5, 6, 8, 8] -> [0, 2, 3].
+    """
+    if not len(codes):
+        return np.array([], dtype = 'int64')
+    return np.flatnonzero(np.concatenate([[True], codes[1:] != codes[:-1]]))
+
+
+
+def sum_groups(values, starts):
+    """
+    Return the sum and the number of obs (NaN skipped) of each group of rows in a 2-D float64 array, as
+    (sums, counts). Groups are consecutive rows, starting at row positions `starts`.
+
+    Sums are compensated (Kahan) sums over the rows of a group in order, as pandas computes them (e.g.,
+    resample().mean()), so results are bit-for-bit the same as pandas. All groups are summed together,
+    one vectorized step per row position within a group, i.e., as many steps as rows in the longest group.
+    """
+    lengths = np.diff(np.append(starts, len(values)))
+    sums = np.zeros((len(starts), values.shape[1]))
+    compensation = np.zeros_like(sums)
+    counts = np.zeros(sums.shape, dtype = 'int64')
+    for offset in range(lengths.max(initial = 0)):
+        groups = np.flatnonzero(lengths > offset)
+        value = values[starts[groups] + offset]
+        valid = ~np.isnan(value)
+
+        total, comp = sums[groups], compensation[groups]
+        y = value - comp
+        t = total + y
+        new_comp = (t - total) - y
+        # e.g., an infinite value: keep the sum infinite instead of NaN.
+        new_comp[np.isnan(new_comp)] = 0
+
+        sums[groups] = np.where(valid, t, total)
+        compensation[groups] = np.where(valid, new_comp, comp)
+        counts[groups] += valid
+
+    return sums, counts
+
+
+
+def reduce_groups(values, starts, how:str = 'mean'):
+    """
+    This function reduces each group of rows in a 2-D float64 array to one row. Groups are consecutive rows,
+    starting at row positions `starts`. min, max, first and last take one vectorized pass (ufunc.reduceat);
+    mean and sum are compensated sums (see `sum_groups`), the same as pandas.
+
+    Missing obs (NaN) are skipped, as pandas does:
+        mean, min, max, first, last:    NaN if a group has no obs.
+        sum:                            0 if a group has no obs.
+    """
+    if how not in AGGREGATORS:
+        raise ValueError(f'Unknown aggregator "{how}". Choose one of {AGGREGATORS}.')
+    if not len(starts):
+        return np.empty((0, values.shape[1]))
+
+    if how in ['mean', 'sum']:
+        sums, counts = sum_groups(values, starts)
+        if how == 'sum':
+            return sums
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            return np.where(counts > 0, sums / counts, np.nan)
+
+    valid = ~np.isnan(values)
+    if how == 'min':
+        return np.fmin.reduceat(values, starts, axis = 0)
+    if how == 'max':
+        return np.fmax.reduceat(values, starts, axis = 0)
+
+    # first/last: row position of the first/last obs of each group, -1 if there is none.
+    rows = np.arange(len(values))[:, None]
+    if how == 'first':
+        pos = np.minimum.reduceat(np.where(valid, rows, len(values)), starts, axis = 0)
+        pos[pos == len(values)] = -1
+    else:
+        pos = np.maximum.reduceat(np.where(valid, rows, -1), starts, axis = 0)
+    result = np.take_along_axis(values, np.maximum(pos, 0), axis = 0)
+    result[pos < 0] = np.nan
+    return result
+
+
+
+def get_period_span(freq) -> pd.Timedelta:
+    """
+    Return the length of a period of frequency freq, used to compare frequencies (D < M < Q < A).
+    """
+    period = pd.Period('2001-01-01', freq = freq)
+    return period.end_time - period.start_time
+
+
+
+class period_series():
+    """
+    The columns (except Time) of a df, kept as a 2-D float64 block indexed by period ordinals.
+    Time can be a period, datetime (taken as daily) or string column (e.g., 2025Q1, 2025-08).
+
+    The df is read once and never modified.
+    """
+    def __init__(self, df):
+        time_col = df['Time']
+        kind, _ = get_time_keys(time_col)
+        if kind == 'datetime':
+            time_col = time_col.dt.to_period('D')
+        elif kind == 'value':
+            time_col = pd.Series(pd.PeriodIndex([pd.Period(str(i)) for i in time_col]))
+
+        self.freq = time_col.dtype.freq
+        self.ordinals = time_col.array.asi8
+        self.names = df.columns.drop('Time')
+        self.values = df[self.names].to_numpy(dtype = 'float64')
+        if len(self.ordinals) > 1 and not (self.ordinals[1:] > self.ordinals[:-1]).all():
+            order = np.argsort(self.ordinals, kind = 'stable')
+            self.ordinals, self.values = self.ordinals[order], self.values[order]
+
+
+    def align(self, periods, how:str = 'mean'):
+        """
+        Return the values of this series in `periods` (a PeriodIndex, e.g., the periods of a chart), as a
+        2-D array with one row per period. Periods without obs are NaN.
+
+        how: aggregator used if this series has a higher frequency than periods (see `reduce_groups`).
+        """
+        target_freq = periods.freq
+        target = periods.asi8
+
+        if self.freq == target_freq:
+            codes, values = self.ordinals, self.values
+        elif get_period_span(self.freq) < get_period_span(target_freq):
+            # Downsample: group obs by the target period they fall in. Ordinals stay sorted after asfreq.
+            codes = pd.PeriodIndex.from_ordinals(self.ordinals, freq = self.freq).asfreq(target_freq).asi8
+            starts = get_group_starts(codes)
+            codes, values = codes[starts], reduce_groups(self.values, starts, how)
+        else:
+            # Upsample: each target period takes the value of the period of this series it falls in.
+            codes, values = self.ordinals, self.values
+            target = periods.asfreq(self.freq).asi8
+
+        pos = np.searchsorted(codes, target)
+        pos = np.minimum(pos, len(codes) - 1)
+        found = (codes[pos] == target) if len(codes) else np.zeros(len(target), dtype = bool)
+
+        result = np.full((len(target), values.shape[1]), np.nan)
+        result[found] = values[pos[found]]
+        return result
@@ -0,0 +1,180 @@
+"""
+An opt-in profiler of the pipeline behind a chart: load -> merge -> frequency conversion -> unit
+transformation -> table -> chart spec.
+
+It is turned on by the query parameter `profile=1` (e.g., http://localhost:8501/timeseriesdata?profile=1)
+or by the environment variable PIPELINE_PROFILE=1. Then each run of the page (or of a line_frame fragment)
+records, for each stage, its time, the rows processed, the bytes produced and whether it was a cache hit,
+and shows them in a collapsible panel, together with the size of session_state.
+
+Stages are recorded with:
+
+    with profiler.stage('load_dataset', name = 'NGDP-BEA-Q.csv') as record:
+        df = ...
+        record['rows'] = len(df)
+
+Outside a Streamlit run (e.g., in benchmarks), `stage` only yields a dict that is thrown away.
+
+Worker threads (e.g., the thread pool of `merge_data_df`) have no access to session_state. Pass them the
+collector of the run, so their stages are recorded too:
+
+    collector = profiler.get_collector()
+    def load(path, collector):
+        with profiler.collect(collector):
+            return load_dataset(path)
+"""
+import os, time, pickle, threading, contextlib
+import pandas as pd
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from MyTools.data_cache import get_object_size
+from MyTools import tracing
+
+
+PROFILE_STATE = 'pipeline_profile'
+PROFILE_QUERY_PARAM = 'profile'
+PROFILE_ENV = 'PIPELINE_PROFILE'
+PANEL_COLUMNS = ['stage', 'name', 'ms', 'rows', 'bytes', 'cache']
+# Number of stages the current thread is inside of, and the collector of a worker thread (see `collect`).
+_local = threading.local()
+
+
+def start_run():
+    """
+    Turn the profiler on or off for this session. Call it at the start of every run of the app (app.py).
+    """
+    if os.environ.get(PROFILE_ENV) == '1' or st.query_params.get(PROFILE_QUERY_PARAM) == '1':
+        st.session_state[PROFILE_STATE] = {'records':[]}
+    else:
+        st.session_state.pop(PROFILE_STATE, None)
+
+
+
+def get_profile():
+    """
+    Return the profile of the current run, or None if the profiler is off.
+    """
+    if get_script_run_ctx(suppress_warning = True) is None:
+        return None
+    return st.session_state.get(PROFILE_STATE)
+
+
+
+def get_collector():
+    """
+    Return the collector of the current run: the profile (None if the profiler is off), the figure of
+    tracing spans and the depth of the current stage. Return None outside a Streamlit run.
+    """
+    collector = getattr(_local, 'collector', None)
+    if collector is not None:
+        return {**collector, 'depth':getattr(_local, 'depth', 0)}
+    if get_script_run_ctx(suppress_warning = True) is None:
+        return None
+    return {
+            'profile':st.session_state.get(PROFILE_STATE),
+            'figure':tracing.get_figure(),
+            'depth':getattr(_local, 'depth', 0),
+            }
+
+
+
+@contextlib.contextmanager
+def collect(collector):
+    """
+    Record the stages run by the current thread (e.g., a worker thread) with collector (see `get_collector`),
+    shown under the stage the collector was taken in. Nothing is recorded if collector is None.
+    """
+    previous = (getattr(_local, 'collector', None), getattr(_local, 'depth', 0))
+    if collector is not None:
+        _local.collector, _local.depth = collector, collector['depth']
+    try:
+        yield
+    finally:
+        _local.collector, _local.depth = previous
+
+
+
+@contextlib.contextmanager
+def stage(stage_name:str, **info):
+    """
+    Time a stage of the pipeline. info (e.g., name = <data_name>) is saved in the record of the stage.
+    Yield the record (a dict), in which callers can save the rows processed ('rows'), the bytes
+    produced ('bytes') and 'hit' or 'miss' ('cache').
+    Stages run inside another stage are shown indented under it.
+
+    In a Streamlit run, every stage is also written as a tracing span, if tracing is on (see MyTools/tracing.py).
+    """
+    record = dict(info)
+    collector = get_collector()
+    if collector is None:
+        yield record
+        return
+
+    profile = collector['profile']
+    depth = collector['depth']
+    record.update(stage = stage_name, depth = depth)
+    if profile is not None:
+        profile['records'].append(record)
+
+    _local.depth = depth + 1
+    start_time, start = time.time(), time.perf_counter()
+    try:
+        yield record
+    except Exception as error:
+        record['error'] = type(error).__name__
+        raise
+    finally:
+        record['ms'] = (time.perf_counter() - start) * 1000
+        _local.depth = depth
+        tracing.write_span(record, start_time, collector['figure'])
+
+
+
+def get_session_state_size() -> int:
+    """
+    Return the size (in bytes) of session_state, measured by pickling each value.
+    """
+    size = 0
+    for key, value in st.session_state.items():
+        if key == PROFILE_STATE:
+            continue
+        try:
+            size += len(pickle.dumps(value))
+        except Exception:
+            size += get_object_size(value)
+    return size
+
+
+
+def show_panel(fragment:bool = False):
+    """
+    Show the stages recorded since the last panel in a collapsible panel, then start a new record.
+    Nothing is shown if the profiler is off or no stage was recorded.
+
+    One panel is shown per run: app.py shows it at the end of a full run of the app. A fragment (e.g.,
+    line_frame.show) calls it with fragment = True, which only shows a panel when the fragment is rerun
+    on its own, without the rest of the app.
+    """
+    profile = get_profile()
+    if not profile or not profile['records']:
+        return
+    if fragment and not get_script_run_ctx().fragment_ids_this_run:
+        return
+
+    df = pd.DataFrame(profile['records']).reindex(columns = PANEL_COLUMNS + ['depth'])
+    df['stage'] = [f'{"· " * depth}{name}' for name, depth in zip(df['stage'], df['depth'])]
+    total_ms = df.loc[df['depth'] == 0, 'ms'].sum()
+    profile['records'] = []
+
+    with st.expander(f'Profile: {total_ms:.1f} ms in this run'):
+        st.dataframe(
+                df[PANEL_COLUMNS],
+                hide_index = True,
+                column_config = {
+                    'ms':st.column_config.NumberColumn(format = '%.2f'),
+                    'rows':st.column_config.NumberColumn(format = '%d'),
+                    'bytes':st.column_config.NumberColumn(format = '%d'),
+                    },
+                )
+        st.caption(f'session_state: {get_session_state_size():,} bytes in {len(st.session_state)} keys')
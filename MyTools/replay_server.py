@@ -0,0 +1,139 @@
+"""
+A local stand-in for the FRED and BEA APIs, which replays the raw responses saved in data/request_data.
+
+It answers the same requests as the real APIs (see MyTools/fetch_request_data.py), so the fetcher can be
+run offline:
+    - FRED (/fred/series/observations): series_id is matched against config_data_request/FRED.json,
+      and only observations on or after `observation_start` are returned.
+    - BEA (/api/data): tablename and frequency are matched against config_data_request/BEA.json, and
+      only records in the requested `year` list (or ALL) are returned.
+
+    python -m MyTools.replay_server --port 8765
+    python -m MyTools.fetch_request_data --base-url http://127.0.0.1:8765
+
+or, from Python:
+
+    with replay_server() as base_url:
+        update_request_data(base_url = base_url)
+"""
+import os, json, argparse, threading, contextlib
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qsl
+
+from MyTools.parse_request_data import REQUEST_DIR, CONFIG_DIR, load_request_config
+
+
+FRED_PATH = '/fred/series/observations'
+BEA_PATH = '/api/data'
+
+
+def get_replay_routes(config_dir = CONFIG_DIR) -> dict:
+    """
+    Map request parameters to data names.
+    Return {('FRED', <series_id>): <data_name>, ('BEA', <tablename>, <frequency>): <data_name>}.
+    """
+    routes = {}
+    for data_name, (platform, data_info) in load_request_config(config_dir).items():
+        params = data_info['params']
+        if platform == 'FRED':
+            routes[('FRED', params['series_id'])] = data_name
+        else:
+            routes[('BEA', params['tablename'], params['frequency'])] = data_name
+
+    return routes
+
+
+
+def filter_FRED(response:dict, params:dict) -> dict:
+    observation_start = params.get('observation_start', '')
+    response['observations'] = [obs for obs in response['observations'] if obs['date'] >= observation_start]
+    response['observation_start'] = observation_start or response['observation_start']
+    response['count'] = len(response['observations'])
+    return response
+
+
+
+def filter_BEA(response:dict, params:dict) -> dict:
+    years = params.get('year', 'ALL')
+    if years.upper() != 'ALL':
+        years = set(years.split(','))
+        results = response['BEAAPI']['Results']
+        results['Data'] = [record for record in results['Data'] if record['TimePeriod'][:4] in years]
+    return response
+
+
+
+def make_handler(request_dir, routes:dict):
+    """
+    Return a request handler class that replays files in request_dir.
+    """
+    class replay_handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlsplit(self.path)
+            params = dict(parse_qsl(url.query))
+
+            if url.path == FRED_PATH:
+                key, replay_filter = ('FRED', params.get('series_id')), filter_FRED
+            elif url.path == BEA_PATH:
+                key, replay_filter = ('BEA', params.get('tablename'), params.get('frequency')), filter_BEA
+            else:
+                return self.send_error(404, 'Unknown API path')
+
+            data_name = routes.get(key)
+            path_request = os.path.join(request_dir, f'{data_name}.json')
+            if data_name is None or not os.path.exists(path_request):
+                return self.send_error(404, 'No saved response for this request')
+
+            with open(path_request, 'rb') as f:
+                body = json.dumps(replay_filter(json.load(f), params)).encode()
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+
+        def log_message(self, format, *args):
+            # Keep the console quiet.
+            pass
+
+    return replay_handler
+
+
+
+@contextlib.contextmanager
+def replay_server(request_dir = REQUEST_DIR, config_dir = CONFIG_DIR, host = '127.0.0.1', port = 0):
+    """
+    Run the replay server in a background thread and yield its base url (e.g., http://127.0.0.1:8765).
+    port = 0 picks a free port.
+    """
+    server = ThreadingHTTPServer((host, port), make_handler(request_dir, get_replay_routes(config_dir)))
+    thread = threading.Thread(target = server.serve_forever, daemon = True)
+    thread.start()
+    try:
+        yield f'http://{host}:{server.server_address[1]}'
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Replay raw responses in data/request_data as a local FRED/BEA API.')
+    parser.add_argument('--port', type = int, default = 8765)
+    parser.add_argument('--request-dir', default = REQUEST_DIR)
+    args = parser.parse_args()
+
+    with replay_server(args.request_dir, port = args.port) as base_url:
+        print(f'Replaying {args.request_dir} at {base_url} (Ctrl+C to stop)')
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+
+
+
+if __name__ == '__main__':
+    main()
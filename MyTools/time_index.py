@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+
+
+def get_time_keys(time_col):
+    """
+    This function converts a Time column to an array of sortable keys.
+        period column   -> kind 'period', period ordinals (int64)
+        datetime column -> kind 'datetime', nanoseconds since epoch (int64)
+        other columns   -> kind 'value', the values as they are (e.g., strings)
+    Return (kind, keys).
+    """
+    if isinstance(time_col.dtype, pd.PeriodDtype):
+        return 'period', time_col.array.asi8
+    if pd.api.types.is_datetime64_any_dtype(time_col):
+        return 'datetime', time_col.to_numpy(dtype = 'datetime64[ns]').view('int64')
+    return 'value', time_col.to_numpy()
+
+
+
+class time_range_index():
+    """
+    A binary-search index over the sorted Time column of a dataset.
+
+    It returns the row positions of the periods between a first and a last period in O(log n), so a
+    time horizon can be selected through `df.iloc[...]` (a slice of rows) instead of `df.query(...)`.
+
+    Periods can be given as strings (e.g., '2025Q1', '2025-08', '2025-08-01') or pd.Period objects.
+    If the frequency of a period differs from the frequency of the dataset, the first period is converted
+    to the start of its span and the last period to the end of its span. For instance, given a monthly
+    dataset, '2025Q1' as the first period refers to 2025-01 and '2025Q1' as the last period refers to 2025-03.
+    """
+    def __init__(self, time_col):
+        self.kind, self.keys = get_time_keys(time_col)
+        # Period frequency of the dataset, such as <QuarterEnd: startingMonth=12>.
+        self.freq = time_col.dtype.freq if self.kind == 'period' else None
+        if len(self.keys) > 1 and not (self.keys[1:] >= self.keys[:-1]).all():
+            raise ValueError('Time column must be sorted from the past to the present.')
+
+
+    def __len__(self):
+        return len(self.keys)
+
+
+    def get_key(self, period, how:str = 'start'):
+        """
+        Convert a period to the type of keys in the index.
+        how: 'start' or 'end', decides which end of a lower-frequency period to use.
+        """
+        if self.kind == 'datetime':
+            timestamp = pd.Timestamp(str(period)) if how == 'start' else pd.Period(str(period)).end_time
+            return timestamp.value
+        if self.kind == 'period':
+            period = period if isinstance(period, pd.Period) else pd.Period(str(period))
+            return period.asfreq(self.freq, how = how).ordinal
+        return period
+
+
+    def get_slice(self, first_period, last_period) -> slice:
+        """
+        Return the row positions of periods in [first_period, last_period] as a slice.
+        """
+        start = np.searchsorted(self.keys, self.get_key(first_period, 'start'), side = 'left')
+        end = np.searchsorted(self.keys, self.get_key(last_period, 'end'), side = 'right')
+        return slice(int(start), int(max(start, end)))
+
+
+    def select(self, df, first_period, last_period):
+        """
+        Return rows of df in [first_period, last_period]. df must share the row order of this index.
+        """
+        return df.iloc[self.get_slice(first_period, last_period)]
@@ -0,0 +1,190 @@
+"""
+Tracing spans of the pipeline behind a chart, written to a rotating JSON-lines file (logs/trace.jsonl,
+under the root of the project, whatever the working directory of the server).
+
+Each stage timed by `profiler.stage` (load_dataset, merge_data_df, unit_transformation, chart spec, ...)
+in a Streamlit run is written as one span:
+
+    {"ts": "2026-10-17T09:30:12.402", "figure": "Gross domestic product (quarterly)", "stage": "load_dataset",
+     "name": "NGDP-BEA-Q.csv", "depth": 0, "ms": 1.92, "rows": 314, "cache": "hit"}
+
+Spans are handed to a queue and written by a background thread (logging QueueListener), so a render
+never waits on the disk. The file is rotated at TRACE_MAX_BYTES, keeping TRACE_BACKUPS old files.
+
+Tracing is opt-in: it is off unless the environment variable PIPELINE_TRACE=1 is set, e.g.,
+
+    PIPELINE_TRACE=1 streamlit run app.py
+
+Latency percentiles per stage and per figure, over the trace file and its backups:
+
+    python -m MyTools.tracing
+    python -m MyTools.tracing --since 2026-10-01 --by figure
+"""
+import os, json, queue, atexit, logging, argparse, threading
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+import pandas as pd
+import streamlit as st
+
+
+# Root of the project (the parent of MyTools), so spans are written to the same file whatever the working directory.
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TRACE_PATH = os.path.join(PROJECT_DIR, 'logs', 'trace.jsonl')
+TRACE_MAX_BYTES = 20 * 1024 * 1024
+TRACE_BACKUPS = 5
+TRACE_ENV = 'PIPELINE_TRACE'
+# Session state that saves the figure shown, so spans of fragment reruns are attributed to it.
+FIGURE_STATE = 'trace_figure'
+PERCENTILES = [0.5, 0.95, 0.99]
+
+logger = logging.getLogger('pipeline.trace')
+logger.propagate = False
+_listener = None
+_listener_lock = threading.Lock()
+
+
+# ~~~~~~~~~~~~~~~~~~~~~
+# Writer
+# ~~~~~~~~~~~~~~~~~~~~~
+
+def is_enabled() -> bool:
+    return os.environ.get(TRACE_ENV) == '1'
+
+
+
+def start_writer(path_trace = TRACE_PATH):
+    """
+    Start the background thread that writes spans to path_trace (once per process).
+    """
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            return
+
+        os.makedirs(os.path.dirname(path_trace) or '.', exist_ok = True)
+        file_handler = RotatingFileHandler(path_trace, maxBytes = TRACE_MAX_BYTES, backupCount = TRACE_BACKUPS, encoding = 'utf-8')
+        file_handler.setFormatter(logging.Formatter('%(message)s'))
+
+        span_queue = queue.SimpleQueue()
+        logger.addHandler(QueueHandler(span_queue))
+        logger.setLevel(logging.INFO)
+        _listener = QueueListener(span_queue, file_handler)
+        _listener.start()
+        # Write the spans left in the queue when the server stops.
+        atexit.register(_listener.stop)
+
+
+
+def set_figure(fig_name:str):
+    """
+    Attribute the spans of this session to fig_name (e.g., the chart chosen in pages/time_series_data.py).
+    """
+    st.session_state[FIGURE_STATE] = fig_name
+
+
+
+def get_figure() -> str:
+    """
+    Return the figure the spans of this session are attributed to (see `set_figure`).
+    """
+    return st.session_state.get(FIGURE_STATE, '')
+
+
+
+def write_span(record:dict, start:float, figure:str = ''):
+    """
+    Queue a span: the record of a stage (see `profiler.stage`) that started at `start` (a unix timestamp),
+    attributed to figure. It does not read session_state, so it can be called from worker threads.
+    """
+    if not is_enabled():
+        return
+    if _listener is None:
+        try:
+            start_writer()
+        except OSError:
+            # e.g., read-only file system. Tracing is skipped.
+            return
+
+    span = {
+            'ts':datetime.fromtimestamp(start).isoformat(timespec = 'milliseconds'),
+            'figure':figure,
+            **record,
+            'ms':round(record['ms'], 3),
+            }
+    logger.info(json.dumps(span, default = str))
+
+
+# ~~~~~~~~~~~~~~~~~~~~~
+# Report
+# ~~~~~~~~~~~~~~~~~~~~~
+
+def read_spans(path_trace = TRACE_PATH, since:str = ''):
+    """
+    Return the spans in path_trace and its rotated backups (path_trace.1, path_trace.2, ...) as a df.
+    since: if given (e.g., 2026-10-01), only spans from this time onwards.
+    """
+    paths = [f'{path_trace}.{i}' for i in range(TRACE_BACKUPS, 0, -1)] + [path_trace]
+    spans = []
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        with open(path, encoding = 'utf-8') as f:
+            for line in f:
+                try:
+                    spans.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # e.g., the last line of a file being written.
+                    continue
+
+    df = pd.DataFrame(spans, columns = ['ts', 'figure', 'stage', 'name', 'depth', 'ms', 'rows', 'bytes', 'cache'])
+    df['ts'] = pd.to_datetime(df['ts'])
+    if since:
+        df = df[df['ts'] >= pd.Timestamp(since)]
+
+    return df
+
+
+
+def get_latency_report(df, by:list):
+    """
+    Return the number of spans, the share of cache hits and the p50, p95 and p99 latency (ms) of spans,
+    grouped by columns in `by`, sorted by p95.
+    """
+    groups = df.groupby(by, dropna = False)
+    report = groups['ms'].quantile(PERCENTILES).unstack()
+    report.columns = [f'p{int(q * 100)} ms' for q in PERCENTILES]
+    report.insert(0, 'count', groups.size())
+    report.insert(1, 'hit rate', groups['cache'].apply(lambda cache: (cache == 'hit').sum() / cache.notna().sum() if cache.notna().any() else float('nan')))
+
+    return report.sort_values('p95 ms', ascending = False)
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Latency percentiles of pipeline stages, from the trace file.')
+    parser.add_argument('--path', default = TRACE_PATH)
+    parser.add_argument('--since', default = '', help = 'Only spans from this time onwards, e.g., 2026-10-01.')
+    parser.add_argument('--by', choices = ['stage', 'figure', 'both'], default = 'both')
+    args = parser.parse_args()
+
+    df = read_spans(args.path, args.since)
+    if df.empty:
+        print(f'No spans in {args.path}')
+        return
+
+    print(f'{len(df)} spans from {df["ts"].min()} to {df["ts"].max()}')
+    with pd.option_context('display.width', 250, 'display.max_rows', None, 'display.max_columns', None, 'display.float_format', '{:.2f}'.format):
+        if args.by in ['stage', 'both']:
+            print('\n### Per stage')
+            print(get_latency_report(df, ['stage']))
+        if args.by in ['figure', 'both']:
+            # Time of a figure: spans at depth 0 (stages not run inside another stage).
+            print('\n### Per figure')
+            print(get_latency_report(df[df['depth'] == 0], ['figure']))
+            print('\n### Per figure and stage')
+            print(get_latency_report(df, ['figure', 'stage']))
+
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+
+from MyTools.data_cache import memory_cache, get_df_fingerprint
+
+
+# ~~~~~~~~~~~~~~~~~~~~~
+# Unit transformation engine
+# ~~~~~~~~~~~~~~~~~~~~~
+# Every unit of a dataset is computed in one vectorized pass over the FULL dataset and memoized per
+# (dataset, unit). Choosing a time horizon then only slices rows of the memoized result.
+UNIT_LIST = [
+        'Level',
+        'Change', 'Change from Year Ago',
+        'Percent Change', 'Percent Change from Year Ago',
+        'Natural Log', 'Index'
+        ]
+UNIT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+unit_cache = memory_cache(max_bytes = UNIT_CACHE_MAX_BYTES)
+
+
+def shift_rows(values, periods:int):
+    """
+    Shift the rows of a 2-D array down by `periods`. The first `periods` rows are filled with NaN.
+    """
+    result = np.full(values.shape, np.nan)
+    if periods < len(values):
+        result[periods:] = values[:len(values) - periods]
+    return result
+
+
+
+def fill_forward(values):
+    """
+    Fill missing obs (NaN) in each column of a 2-D array with the last obs before them, as pandas `ffill`.
+    Leading missing obs are kept.
+    """
+    rows = np.where(np.isnan(values), 0, np.arange(len(values))[:, None])
+    rows = np.maximum.accumulate(rows, axis = 0)
+    return np.take_along_axis(values, rows, axis = 0)
+
+
+
+def transform_values(values, window:int) -> dict:
+    """
+    This function computes every unit (except Index, which depends on the first period shown) for a
+    2-D array of values, in which each row refers to obs from a period and each column refers to a variable.
+
+    window: number of periods in a year, used for YoY change and YoY percentage change.
+
+    Return a dict, {<unit>: 2-D array}.
+    """
+    lag_one = shift_rows(values, 1)
+    lag_year = shift_rows(values, window)
+    # As pandas `pct_change` (fill_method = 'pad'), percentage changes are computed over filled obs, e.g.,
+    # a discontinued series is 0% after its last obs.
+    filled = fill_forward(values)
+
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        return {
+                'Level': values,
+                'Change': values - lag_one,
+                'Change from Year Ago': values - lag_year,
+                'Percent Change': (filled / shift_rows(filled, 1) - 1) * 100,
+                'Percent Change from Year Ago': (filled / shift_rows(filled, window) - 1) * 100,
+                'Natural Log': np.log(values),
+                }
+
+
+
+def get_unit_frames(df, data_name:str, window:int, fingerprint:str = None):
+    """
+    Return a dict, {<unit>: df}, containing df in every unit. Time is the first column of each df.
+    Results are memoized per (data_name, content of df, unit).
+
+    fingerprint: the content hash of df (see `get_df_fingerprint`), e.g., the one a line_frame computes
+    once. If not given, it is computed from df, which reads the whole df on every call.
+    """
+    fingerprint = fingerprint or get_df_fingerprint(df)
+    frames = {unit:unit_cache.get((data_name, fingerprint, window, unit)) for unit in UNIT_LIST[:-1]}
+    if all(frame is not None for frame in frames.values()):
+        return frames
+
+    cols = df.columns.to_list()
+    cols.remove('Time')
+    values = df[cols].to_numpy(dtype = 'float64')
+    time_col = df['Time'].reset_index(drop = True)
+
+    for unit, unit_values in transform_values(values, window).items():
+        frame = pd.DataFrame(unit_values, columns = cols)
+        frame.insert(0, 'Time', time_col)
+        frames[unit] = unit_cache.put((data_name, fingerprint, window, unit), frame)
+
+    return frames
+
+
+
+def get_unit_df(unit:str, df, data_name:str, window:int, period_slice = slice(None), fingerprint:str = None):
+    """
+    This function returns df converted to unit, restricted to rows in period_slice (row positions).
+
+    Index scales the value of the first period in period_slice to 100, so it is computed from the
+    Level slice instead of being memoized. fingerprint: see `get_unit_frames`.
+    """
+    frames = get_unit_frames(df, data_name, window, fingerprint)
+
+    if unit == 'Index':
+        level = frames['Level'].iloc[period_slice]
+        if level.empty:
+            return level
+        values = level.drop('Time', axis = 1)
+        return pd.concat([level[['Time']], values / values.iloc[0, :].values * 100], axis = 1)
+
+    return frames[unit].iloc[period_slice]
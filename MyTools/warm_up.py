@@ -0,0 +1,149 @@
+"""
+Warm up the process-wide caches when the server starts, so the first visitor after a deploy does not pay
+the cold cost of each chart.
+
+In worker threads, it:
+    1. loads every dataset listed in variables_in_database.csv (dataset_cache, see MyTools/load_data.py),
+    2. builds the monthly, quarterly and annual rollups of daily datasets (see MyTools/frequency_conversion.py),
+    3. computes the derived series, e.g., RGDP and shares of GDP (see MyTools/derived_series.py),
+    4. computes the view each chart shows first (Level, last 4 periods) in view_cache and unit_cache
+       (see `warm_default_view`).
+
+app.py starts it once per server process (st.cache_resource), in the background. It can also be run
+from the command line to time it:
+
+    python -m MyTools.warm_up
+"""
+import os, time, logging, argparse, threading
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+
+from MyTools.load_data import load_dataset
+from MyTools.frequency_conversion import ROLLUP_FREQUENCIES, load_rollup
+from MyTools.derived_series import DATA_DIR, DERIVED_SERIES, get_derived_series
+from MyTools.merge_data import merge_data_df
+from MyTools.chart_tools import load_chart_config
+from MyTools.chart_template.select_column_to_plot import warm_default_view
+
+
+logger = logging.getLogger(__name__)
+
+PATH_VARIABLE_LIST = 'variables_in_database.csv'
+PATH_CHART_CONFIG = os.path.join('config', 'chart_config.json')
+MAX_WORKERS = 8
+
+# Charts whose first view is computed, as they are built in pages/time_series_data.py and pages/inflation.py:
+#     (name of the line_frame, derived series or dataset, key of its indent config in chart_config.json)
+DEFAULT_VIEWS = [
+        ('NGDP-BEA-Q', 'NGDP-BEA-Q', 'NGDP-BEA'),
+        ('NGDP-BEA-A', 'NGDP-BEA-A', 'NGDP-BEA'),
+        ('NGDP-BEA-Q_share', 'NGDP-BEA-Q_share', 'NGDP-BEA'),
+        ('NGDP-BEA-A_share', 'NGDP-BEA-A_share', 'NGDP-BEA'),
+        ('RGDP_Q', 'RGDP_Q', 'NGDP-BEA'),
+        ('RGDP_A', 'RGDP_A', 'NGDP-BEA'),
+        ('GDI-BEA-Q', 'GDI-BEA-Q', 'GDI-BEA'),
+        ('GDI-BEA-A', 'GDI-BEA-A', 'GDI-BEA'),
+        ('PCE-BEA-M', 'PCE-BEA-M', 'PCE-BEA'),
+        ]
+# "Monetary Policy and Interest Rate (monthly)" in pages/time_series_data.py
+POLICY_RATES_VIEW = 'Monetary Policy and Interest Rate (monthly)'
+POLICY_RATES = [
+        'FFER-FRED-D',
+        'FFRTUPPER-FRED-D',
+        'FFRTLOWER-FRED-D',
+        'FFRT-FRED-D',
+        'DISCOUNTPRIMARY-FRED-D',
+        'SREPOMR-FRED-D',
+        'IORR-FRED-D',
+        'IORB-FRED-D',
+        'ONRRP-FRED-D',
+        ]
+
+
+def warm_view(frame_name, series_name, indent_name, data_dir, chart_config:dict):
+    df = get_derived_series(series_name, data_dir)
+    warm_default_view(frame_name, df, chart_config.get(indent_name, {}))
+
+
+
+def warm_policy_rates(data_dir):
+    warm_default_view(POLICY_RATES_VIEW, merge_data_df(POLICY_RATES, target_freq = 'M', data_dir = data_dir))
+
+
+
+def run_stage(executor, stage:str, tasks:list) -> int:
+    """
+    Run tasks (a list of (function, args)) in the worker threads and wait for them.
+    A failed task is logged and skipped, so one missing file does not stop the warm-up.
+    Return the number of tasks that failed.
+    """
+    start = time.perf_counter()
+    futures = [executor.submit(func, *args) for func, args in tasks]
+    n_failed = 0
+    for future in futures:
+        try:
+            future.result()
+        except Exception:
+            n_failed += 1
+            logger.exception(f'Warm-up: a task of stage "{stage}" failed.')
+
+    logger.info(f'Warm-up: {stage}, {len(tasks)} tasks in {time.perf_counter() - start:.2f}s')
+    return n_failed
+
+
+
+def warm_up(data_dir = DATA_DIR, path_variable_list = PATH_VARIABLE_LIST, path_chart_config = PATH_CHART_CONFIG,
+            max_workers:int = MAX_WORKERS) -> int:
+    """
+    This function fills the caches (see the top of this file) with max_workers threads.
+    Each stage runs in parallel and starts once the previous stage is done, since it reads its results.
+    Return the number of tasks that failed.
+    """
+    data_name_list = [data_name for data_name in pd.read_csv(path_variable_list, index_col = 0).index
+                      if os.path.exists(os.path.join(data_dir, f'{data_name}.csv'))]
+    daily_list = [data_name for data_name in data_name_list if data_name.endswith('-D')]
+    chart_config = load_chart_config(path_chart_config)
+
+    stages = [
+            ('load datasets', [(load_dataset, (os.path.join(data_dir, f'{data_name}.csv'),)) for data_name in data_name_list]),
+            ('rollups', [(load_rollup, (os.path.join(data_dir, f'{data_name}.csv'), freq))
+                         for data_name in daily_list for freq in ROLLUP_FREQUENCIES]),
+            ('derived series', [(get_derived_series, (name, data_dir)) for name in DERIVED_SERIES]),
+            ('default views', [(warm_view, (*view, data_dir, chart_config)) for view in DEFAULT_VIEWS]
+                              + [(warm_policy_rates, (data_dir,))]),
+            ]
+
+    start = time.perf_counter()
+    n_failed = 0
+    with ThreadPoolExecutor(max_workers = max_workers, thread_name_prefix = 'warm_up') as executor:
+        for stage, tasks in stages:
+            n_failed += run_stage(executor, stage, tasks)
+    logger.info(f'Warm-up done in {time.perf_counter() - start:.2f}s ({n_failed} tasks failed)')
+
+    return n_failed
+
+
+
+def start_warm_up(**kwargs) -> threading.Thread:
+    """
+    Run `warm_up` in a background thread, so the server answers visitors while caches are filled.
+    A visitor asking for a chart that is not warm yet computes it as usual.
+    """
+    thread = threading.Thread(target = warm_up, kwargs = kwargs, name = 'warm_up', daemon = True)
+    thread.start()
+    return thread
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Fill the process-wide caches, as the app does at start.')
+    parser.add_argument('--max-workers', type = int, default = MAX_WORKERS)
+    args = parser.parse_args()
+
+    logging.basicConfig(level = logging.INFO, format = '%(message)s')
+    warm_up(max_workers = args.max_workers)
+
+
+
+if __name__ == '__main__':
+    main()
@@ -2,6 +2,9 @@ import json, os
 import altair as alt
 import streamlit as st
 
+from MyTools import profiler
+from MyTools import warm_up
+
 def set_dark_theme():
     st.session_state.main_bg_color = '#2E3440'
     st.session_state.main_font_color = '#A7BAD1'
@@ -23,6 +26,14 @@ def set_light_theme():
 
 alt.renderers.enable('png')
 
+
+@st.cache_resource
+def start_warm_up():
+    """
+    Fill the caches shared by sessions in the background, once per server process (see MyTools/warm_up.py).
+    """
+    return warm_up.start_warm_up()
+
 # ~~~~~~~~~~~~~~~~~~~~~~~
 # Set path
 # ~~~~~~~~~~~~~~~~~~~~~~~
@@ -34,6 +45,8 @@ current_dir = os.getcwd()
 # ~~~~~~~~~~~~~~~~~~~~~~~
 st.set_page_config(layout = 'wide')
 
+start_warm_up()
+
 
 # ~~~~~~~~~~~~~~~~~~~~~~~
 # Initialize pages
@@ -65,6 +78,10 @@ pages = {
         "Topics":topics
         }
 pg = st.navigation(pages)
+
+# Add ?profile=1 to the url to show the time spent in each stage of this run (see MyTools/profiler.py).
+profiler.start_run()
 pg.run()
+profiler.show_panel()
 
 
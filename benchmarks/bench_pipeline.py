@@ -0,0 +1,259 @@
+"""
+Benchmark of the load -> merge -> transform -> render pipeline behind a line_frame.
+
+It runs headless (no `streamlit run` needed) against a copy of the datasets in data/parse_data, made in a
+temporary directory for each scale, so the parquet copies and rollups of the app are never touched. It times
+each stage separately. For each stage, it reports the median time over `--repeat` runs, the peak memory
+allocated during one run (tracemalloc), and the size of the chart spec for the render stages.
+
+Synthetic scale-ups multiply the rows (periods) or the columns (series) of the daily policy rates, so
+regressions and scaling limits show up before deploy.
+
+Run from the root of the project:
+
+    python -m benchmarks.bench_pipeline
+    python -m benchmarks.bench_pipeline --scales 1 rows:10 rows:100 cols:10 cols:100 --repeat 5
+"""
+import os, time, json, shutil, logging, argparse, tempfile, warnings, tracemalloc
+from statistics import median
+
+import numpy as np
+import pandas as pd
+
+# Streamlit warns about the missing script run context on every call to st.session_state in bare mode.
+logging.disable(logging.WARNING)
+warnings.filterwarnings('ignore')
+
+import streamlit as st
+
+from MyTools import load_data, frequency_conversion, unit_engine
+from MyTools.load_data import load_dataset
+from MyTools.merge_data import merge_data_df
+from MyTools.frequency_conversion import convert_frequency
+from MyTools.columnar_store import get_columnar_path
+from MyTools.chart_transport import serialize_chart
+from MyTools.chart_template import select_column_to_plot as frame
+
+
+DATA_DIR = os.path.join('data', 'parse_data')
+POLICY_RATES = [
+        'FFER-FRED-D',
+        'FFRTUPPER-FRED-D',
+        'FFRTLOWER-FRED-D',
+        'FFRT-FRED-D',
+        'DISCOUNTPRIMARY-FRED-D',
+        'SREPOMR-FRED-D',
+        'IORR-FRED-D',
+        'IORB-FRED-D',
+        'ONRRP-FRED-D',
+        ]
+TARGET_FREQUENCIES = ['M', 'Q', 'A']
+CONTENT_HEIGHT = 660
+
+
+# ~~~~~~~~~~~~~~~~~~~~~
+# Helper functions
+# ~~~~~~~~~~~~~~~~~~~~~
+
+def clear_memory_caches():
+    """
+    Clear every process-wide cache, so the next run pays the cold cost (files on disk are kept).
+    """
+    load_data.dataset_cache.clear()
+    frequency_conversion.rollup_cache.clear()
+    unit_engine.unit_cache.clear()
+    frame.spec_cache.clear()
+    frame.view_cache.clear()
+
+
+def clear_disk_caches(data_dir, data_name_list):
+    """
+    Remove parquet copies and rollups of datasets in data_name_list.
+    data_dir must be a temporary copy of the data (see `copy_data`), never data/parse_data.
+    """
+    tmp_dir = os.path.abspath(tempfile.gettempdir())
+    if os.path.commonpath([os.path.abspath(data_dir), tmp_dir]) != tmp_dir:
+        raise ValueError(f'{data_dir} is not a temporary copy of the data. The benchmark only removes files in its own copy.')
+
+    for data_name in data_name_list:
+        path_data = os.path.join(data_dir, f'{data_name}.csv')
+        paths = [get_columnar_path(path_data)]
+        paths += [frequency_conversion.get_rollup_path(path_data, freq) for freq in TARGET_FREQUENCIES]
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def measure(stage:str, func, repeat:int, setup = None) -> dict:
+    """
+    Run func `repeat` times and return the median time (ms) and the peak memory (MB) of one run.
+    setup (if given) runs before each run and is not timed.
+    """
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+
+    if setup:
+        setup()
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {'stage':stage, 'ms':median(times) * 1000, 'peak_mb':peak / 1024 ** 2, 'result':result}
+
+
+def copy_data(data_dir):
+    """
+    This function copies the daily policy rates to data_dir and returns the data names.
+    """
+    for data_name in POLICY_RATES:
+        shutil.copy(os.path.join(DATA_DIR, f'{data_name}.csv'), data_dir)
+    return POLICY_RATES
+
+
+def make_synthetic_data(data_dir, scale:str):
+    """
+    This function writes a synthetic copy of the daily policy rates to data_dir and returns the data names.
+        'rows:k':   each series has k times as many days (starting on its first day, extended forward).
+        'cols:k':   each file has k columns instead of one.
+
+    Days are generated as periods, so series can go beyond the datetime range (1678-2262): they are parsed
+    as periods (see `parse_time_column` in MyTools/columnar_store.py). Dates are written with 4-digit years,
+    so a scale that goes beyond year 9999 (about 100 times FFER, since 1954) raises ValueError.
+    Values follow a random walk rounded to 2 digits, as in the original data.
+    """
+    kind, factor = scale.split(':')
+    factor = int(factor)
+    rng = np.random.default_rng(0)
+
+    data_name_list = []
+    for data_name in POLICY_RATES:
+        df = pd.read_csv(os.path.join(DATA_DIR, f'{data_name}.csv'))
+        n_rows = len(df) * factor if kind == 'rows' else len(df)
+        n_cols = factor if kind == 'cols' else 1
+        time_index = pd.period_range(df['Time'].iloc[0], periods = n_rows, freq = 'D')
+        if time_index[-1].year > 9999:
+            raise ValueError(f'{scale}: {n_rows} days of {data_name} go beyond year 9999 ({time_index[-1].year}).')
+
+        synthetic = pd.DataFrame(
+                (5 + rng.normal(0, 0.05, (n_rows, n_cols)).cumsum(axis = 0)).round(2),
+                columns = [f'{df.columns[1]} {i}' for i in range(n_cols)]
+                )
+        synthetic.insert(0, 'Time', time_index.strftime('%Y-%m-%d'))
+
+        synthetic_name = f'{data_name.split("-")[0]}{scale.replace(":", "x")}-BENCH-D'
+        synthetic.to_csv(os.path.join(data_dir, f'{synthetic_name}.csv'), index = False)
+        data_name_list.append(synthetic_name)
+
+    return data_name_list
+
+
+# ~~~~~~~~~~~~~~~~~~~~~
+# Benchmark
+# ~~~~~~~~~~~~~~~~~~~~~
+
+def run_pipeline(data_dir, data_name_list, repeat:int) -> list:
+    """
+    Time each stage of the pipeline for the datasets in data_name_list (daily data). Return a list of results.
+    """
+    results = []
+    path_first = os.path.join(data_dir, f'{data_name_list[0]}.csv')
+
+    ###------Load------###
+    results.append(measure('load_dataset (csv, cold)', lambda: load_dataset(path_first), repeat,
+                           setup = lambda: (clear_memory_caches(), clear_disk_caches(data_dir, data_name_list[:1]))))
+    results.append(measure('load_dataset (parquet, cold)', lambda: load_dataset(path_first), repeat, setup = clear_memory_caches))
+    results.append(measure('load_dataset (warm)', lambda: load_dataset(path_first), repeat))
+
+    ###------Merge------###
+    for target_freq in [''] + TARGET_FREQUENCIES:
+        label = target_freq or 'D'
+        results.append(measure(f'merge_data_df {label} (cold)', lambda: merge_data_df(data_name_list, target_freq, data_dir), repeat,
+                               setup = clear_memory_caches))
+        results.append(measure(f'merge_data_df {label} (warm)', lambda: merge_data_df(data_name_list, target_freq, data_dir), repeat))
+
+    ###------Frequency conversion------###
+    df_daily = merge_data_df(data_name_list, '', data_dir)
+    df_daily = df_daily[['Time'] + [col for col in df_daily.columns if col != 'Time']]
+    for target_freq in TARGET_FREQUENCIES:
+        results.append(measure(f'convert_frequency {target_freq}', lambda: convert_frequency(df_daily, target_freq), repeat))
+
+    ###------Unit transformation------###
+    df = df_daily.copy()
+    if not isinstance(df['Time'].dtype, pd.PeriodDtype):
+        df['Time'] = df['Time'].dt.to_period('D')
+    # One line_frame per scale: its session state (e.g., line formats) is initialized for the columns of its df.
+    lf = frame.line_frame(f'BENCH-{data_name_list[0]}', df)
+    # As in line_frame, units are memoized on the fingerprint of the line_frame, computed once.
+    transform = lambda unit: frame.unit_transformation(unit, lf.df, lf.data_name, '', fingerprint = lf.fingerprint)
+    for unit in unit_engine.UNIT_LIST:
+        results.append(measure(f'unit_transformation {unit} (cold)', lambda: transform(unit), repeat, setup = unit_engine.unit_cache.clear))
+        results.append(measure(f'unit_transformation {unit} (warm)', lambda: transform(unit), repeat))
+
+    ###------Table and plot df (all periods)------###
+    df_level = transform('Level')
+    results.append(measure('table_model', lambda: frame.table_model(df_level), repeat))
+    df_show = frame.table_model(df_level)
+    selected_items = list(range(len(df_show)))
+    results.append(measure('get_plot_df', lambda: df_show.get_plot_df(selected_items), repeat))
+
+    ###------Chart spec------###
+    plot_df = df_show.get_plot_df(selected_items)
+    for n_buckets, label in [(lf.n_buckets, 'downsampled'), (0, 'full resolution')]:
+        st.session_state[lf.state_name_full_resolution] = not n_buckets
+        build = lambda: lf.get_chart_lines(plot_df.copy(), CONTENT_HEIGHT, n_buckets = n_buckets).configure_axis(grid = False)
+        results.append(measure(f'get_chart_lines build ({label})', build, repeat))
+
+        chart = build()
+        for transport in ['json', 'arrow']:
+            result = measure(f'serialize {transport} ({label})', lambda: serialize_chart(chart, transport), repeat)
+            spec, datasets = result['result']
+            result['spec_kb'] = (len(spec) + sum(len(i) for i in datasets.values())) / 1024
+            results.append(result)
+
+    return results
+
+
+def print_results(title:str, results:list):
+    print(f'\n### {title}')
+    print(f'{"stage":<55}{"median ms":>12}{"peak MB":>10}{"spec kB":>10}')
+    for result in results:
+        spec_kb = f'{result["spec_kb"]:.1f}' if 'spec_kb' in result else ''
+        print(f'{result["stage"]:<55}{result["ms"]:>12.2f}{result["peak_mb"]:>10.2f}{spec_kb:>10}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Benchmark the load -> merge -> transform -> render pipeline.')
+    parser.add_argument('--scales', nargs = '+', default = ['1', 'rows:10', 'cols:10'],
+                        help = "'1' for the bundled data, 'rows:k' or 'cols:k' for synthetic scale-ups.")
+    parser.add_argument('--repeat', type = int, default = 3, help = 'Number of timed runs per stage.')
+    parser.add_argument('--output', help = 'Save results to a json file.')
+    args = parser.parse_args()
+
+    all_results = {}
+    for scale in args.scales:
+        # Every scale runs on its own copy of the data, which is removed afterwards.
+        data_dir = tempfile.mkdtemp(prefix = 'bench_pipeline_')
+        try:
+            data_name_list = copy_data(data_dir) if scale == '1' else make_synthetic_data(data_dir, scale)
+            results = run_pipeline(data_dir, data_name_list, args.repeat)
+        finally:
+            shutil.rmtree(data_dir)
+        clear_memory_caches()
+
+        print_results(f'scale {scale}', results)
+        all_results[scale] = [{k:v for k, v in result.items() if k != 'result'} for result in results]
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(all_results, f, indent = 4)
+
+
+
+if __name__ == '__main__':
+    main()
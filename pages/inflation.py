@@ -1,4 +1,4 @@
-import json, os
+import os
 import pandas as pd
 from pathlib import Path
 
@@ -6,10 +6,10 @@ import streamlit as st
 from streamlit.components.v1 import iframe
 
 from MyTools import chart_tools as chart
+from MyTools import tracing
 from MyTools.chart_template.select_column_to_plot import line_frame
 
 from MyTools.load_data import load_dataset
-from MyTools.load_data import get_percentage_share_GDP
 
 
 
@@ -35,8 +35,7 @@ hor_align, ver_align = 'center', 'center'
 # Load Config Files
 # ~~~~~~~~~~~~~~~~~~~~~~~
 ###------Chart config------###
-with open(os.path.join(current_dir, 'config', 'chart_config.json')) as f:
-    chart_config = json.load(f)
+chart_config = chart.load_chart_config(os.path.join(current_dir, 'config', 'chart_config.json'))
 
 # Set the width and height of container used to present chart.
 chart_width = chart_config['chart']['chart_width']
@@ -45,14 +44,14 @@ chart_height = chart.get_chart_height(chart_config['chart']['WHratio'], chart_wi
 iframe_height = chart_height + 30
 
 ###------css config file------###
-with open(os.path.join(current_dir, 'config', 'config.css')) as f:
-    st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html = True)
+st.markdown(f"<style>{chart.load_css(os.path.join(current_dir, 'config', 'config.css'))}</style>", unsafe_allow_html = True)
 
 
 # ~~~~~~~~~~~~~~~~~~~~~~~
 # Load Datasets
 # ~~~~~~~~~~~~~~~~~~~~~~~
 PCE_BEA_M = 'PCE-BEA-M'
+tracing.set_figure(PCE_BEA_M)
 path_PCE_BEA_M = os.path.join(current_dir, 'data', 'parse_data', f"{PCE_BEA_M}.csv")
 df_PCE_BEA_M = load_dataset(path_PCE_BEA_M)
 
@@ -1,4 +1,4 @@
-import json, os, re
+import os, re
 import pandas as pd
 from pathlib import Path
 
@@ -6,40 +6,10 @@ import streamlit as st
 from streamlit.components.v1 import iframe
 
 from MyTools import chart_tools as chart
+from MyTools import tracing
 from MyTools.chart_template.select_column_to_plot import line_frame
-from MyTools.load_data import load_dataset
-from MyTools.load_data import get_percentage_share_GDP
-from MyTools.load_data import get_rgdp
-from MyTools.frequency_conversion import convert_frequency
-
-
-def merge_data_df(data_name_list:list, target_freq = ''):
-    """
-    For each data_name in data_name_list:
-        1. Load corresponding df named <data_name.csv> in directory parse_data.
-            -- Use "Time" column as index, and drop "Time" column.
-        2. Merge all dfs.
-            -- You must make sure that data in all dfs are measured in the same frequency, such as daily, monthly, quarterly...
-    """
-    result = pd.DataFrame()
-    for data_name in data_name_list:
-        df = pd.read_csv(os.path.join('data', 'parse_data', f'{data_name}.csv'), index_col = 'Time')
-        result = pd.concat([result, df], axis = 1)
-        print(df[df.columns.to_list()[0]])
-
-
-    # Convert "Time" index to datetime type, then sort value from past to the present.
-    result.index = pd.to_datetime(result.index)
-    result = result.sort_index()
-    result['Time'] = result.index
-
-    if target_freq:
-        result = convert_frequency(result, target_freq)
-    print(result)
-
-    return result
-
-
+from MyTools.derived_series import get_derived_series
+from MyTools.merge_data import merge_data_df
 
 
 class show_chart():
@@ -160,24 +130,15 @@ class show_chart():
     def show_GDP(self, data_source, description, data_name):
         indent_config = self.chart_config[data_name[:-2]]
 
-        path_data = os.path.join(self.current_dir, 'data', 'parse_data', f"{data_name}.csv")
-        df = load_dataset(path_data)
-
         # If to display percentage share of NGDP
         if self.percent_share_GDP:
             data_name = f"{data_name}_share"
-            df = get_percentage_share_GDP(df, 'Gross domestic product')
         
         if self.isRGDP:
-            # Load GDP deflator
-            if data_name.split('-')[-1] == 'A':
-                df_GDPDeflator = load_dataset(os.path.join(self.current_dir, 'data', 'parse_data', 'GDPDeflator-BEA-A.csv'))
-                data_name = 'RGDP_A'
-            else:
-                df_GDPDeflator = load_dataset(os.path.join(self.current_dir, 'data', 'parse_data', 'GDPDeflator-BEA-Q.csv'))
-                data_name = 'RGDP_Q'
+            # RGDP = NGDP / GDP deflator. See MyTools/derived_series.py
+            data_name = f"RGDP_{data_name.split('-')[-1]}"
 
-            df = get_rgdp(df, df_GDPDeflator)
+        df = get_derived_series(data_name, os.path.join(self.current_dir, 'data', 'parse_data'))
 
         line_frame(data_name, df, indent_config = indent_config, description = description, source = data_source).show()
 
@@ -208,8 +169,7 @@ hor_align, ver_align = 'center', 'center'
 # Load Config Files
 # ~~~~~~~~~~~~~~~~~~~~~~~
 ###------Chart config------###
-with open(os.path.join(current_dir, 'config', 'chart_config.json')) as f:
-    chart_config = json.load(f)
+chart_config = chart.load_chart_config(os.path.join(current_dir, 'config', 'chart_config.json'))
 
 # Set the width and height of container used to present chart.
 chart_width = chart_config['chart']['chart_width']
@@ -254,6 +214,9 @@ fig_list = [
 fig_name = st.selectbox('Choose a chart', fig_list, label_visibility = 'hidden')
 st.divider()
 
+# Tracing spans of this chart are labeled by fig_name (see MyTools/tracing.py).
+tracing.set_figure(fig_name)
+
 show_chart().show(fig_name, chart_config)
 
 